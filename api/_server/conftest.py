@@ -0,0 +1,23 @@
+"""
+Shared pytest setup for the sidecar tests.
+
+wandb_sidecar calls weave.init() at import, which would log in to W&B; the
+tests swap in a stand-in module whose init() is a no-op and whose op() leaves
+the function untraced. Run from this directory:
+
+    python -m pytest -q test_newsroom_core.py test_sidecar.py
+"""
+
+import os, sys, types
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ["WANDB_API_KEY"] = ""   # no wandb.login() from the tests
+
+_weave = types.ModuleType("weave")
+_weave.init = lambda *a, **k: None
+_weave.op = lambda *a, **k: (lambda fn: fn)
+sys.modules.setdefault("weave", _weave)
+
+# Login scripts that talk to W&B, not unit tests
+collect_ignore = ["test_create.py", "test_weave_init.py"]
@@ -142,11 +142,18 @@ app.post("/api/run-cycle", async (req, res) => {
         });
 
         // ── 2. Forward to Weave sidecar for trace emission ──────────────
+        // The sidecar spends at most this budget across draft → learn →
+        // regenerate; we stop waiting shortly after it runs out.
+        const traceBudgetMs = Number(process.env.SIDECAR_TRACE_BUDGET_MS ?? 45000);
         let weaveResult: any = null;
         try {
             const sidecarRes = await fetch("http://localhost:5199/trace", {
                 method: "POST",
-                headers: { "Content-Type": "application/json" },
+                headers: {
+                    "Content-Type": "application/json",
+                    "X-Deadline-Ms": String(traceBudgetMs),
+                },
+                signal: AbortSignal.timeout(traceBudgetMs + 2000),
                 body: JSON.stringify({
                     episode_num: episodeNum,
                     episode_id: out.episode_id ?? `ep_${episodeNum}`,
@@ -0,0 +1,1070 @@
+"""
+newsroom_core.py  —  pieces shared by the sidecar and the Neuron circuit
+=========================================================================
+Everything here is transport-free: the primitives vector and its
+versioned store, the phrase matcher and batch scorer, the eval memo,
+retry policy, circuit breaker, AIMD limiter, single-flight and the
+generation cache.  wandb_sidecar.py (threads, sync httpx) and
+neuron_circuit/newsroom_circuit.py (asyncio, async httpx) import it and
+keep only their own HTTP code and their own evaluate() rubric.  The
+limiter and single-flight come in a thread-safe and an asyncio flavour.
+"""
+
+from __future__ import annotations
+
+import re, time, json, hashlib, random, asyncio, threading
+from abc import ABC, abstractmethod
+from array import array
+from collections.abc import Mapping
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np          # imported lazily where used; only the batch scorer needs it
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# PRIMITIVES  —  the learned weights and their float64 vector form
+# ═══════════════════════════════════════════════════════════════════════════
+
+DEFAULT_PRIMITIVES = {
+    "fact_verification":   0.65,
+    "anti_hyperbole":      0.75,
+    "source_attribution":  0.72,
+    "temporal_accuracy":   0.70,
+    "entertainment_value": 0.80,
+    "brevity":             0.40,
+}
+
+# issue type → (primitive it strengthens, step)
+LEARN_RULES = {
+    "hallucination":  ("fact_verification",  0.15),
+    "unverified":     ("fact_verification",  0.15),
+    "hyperbole":      ("anti_hyperbole",     0.10),
+    "missing_source": ("source_attribution", 0.12),
+    "temporal_vague": ("temporal_accuracy",  0.10),
+}
+
+# Stable name → index layout for PrimitiveVector
+PRIMITIVE_NAMES = tuple(DEFAULT_PRIMITIVES)
+PRIMITIVE_INDEX = {name: i for i, name in enumerate(PRIMITIVE_NAMES)}
+
+
+def primitives_hash(p: dict) -> str:
+    """Stable hash of the primitives dict — changes when any weight changes."""
+    if isinstance(p, PrimitiveVector):
+        return p.digest
+    canonical = json.dumps(p, sort_keys=True)
+    return hashlib.sha1(canonical.encode()).hexdigest()
+
+
+class PrimitiveVector(Mapping):
+    """
+    The six primitives as one float64 array in PRIMITIVE_NAMES order.
+    Read-only Mapping (`p["brevity"]`, `p.get(...)`, `.items()`), so the
+    evaluator and prompt builder take it unchanged.  Never mutated in
+    place: "copies" share the instance, and a change builds one new array
+    via with_deltas()/replace().  The digest is computed once per vector
+    and matches primitives_hash() of the equivalent dict.  Convert with
+    to_dict() at the JSON boundary (traces, Redis, HTTP, SQLite).
+    """
+
+    __slots__ = ("_values", "_digest")
+
+    def __init__(self, values=None):
+        self._values = array("d", values if values is not None
+                             else DEFAULT_PRIMITIVES.values())
+        if len(self._values) != len(PRIMITIVE_NAMES):
+            raise ValueError(f"expected {len(PRIMITIVE_NAMES)} primitives, "
+                             f"got {len(self._values)}")
+        self._digest = None
+
+    @classmethod
+    def from_mapping(cls, m) -> "PrimitiveVector":
+        """Vector from a primitives dict; missing names take their default, unknown names are dropped."""
+        if isinstance(m, cls):
+            return m
+        return cls(float(m.get(name, default)) for name, default in DEFAULT_PRIMITIVES.items())
+
+    def __getitem__(self, name: str) -> float:
+        return self._values[PRIMITIVE_INDEX[name]]
+
+    def __iter__(self):
+        return iter(PRIMITIVE_NAMES)
+
+    def __len__(self) -> int:
+        return len(PRIMITIVE_NAMES)
+
+    def __repr__(self) -> str:
+        return f"PrimitiveVector({self.to_dict()})"
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, PrimitiveVector):
+            return self._values == other._values
+        return Mapping.__eq__(self, other)
+
+    def __hash__(self) -> int:
+        # Not the digest: 0.0 == -0.0 but their JSON (and so digests) differ
+        return hash(tuple(self._values))
+
+    @property
+    def digest(self) -> str:
+        """primitives_hash() of to_dict(), computed on first use."""
+        if self._digest is None:
+            self._digest = hashlib.sha1(json.dumps(self.to_dict(), sort_keys=True).encode()).hexdigest()
+        return self._digest
+
+    def to_dict(self) -> dict:
+        return dict(zip(PRIMITIVE_NAMES, self._values))
+
+    def as_array(self) -> "array":
+        """The raw float64 array (a view — do not mutate)."""
+        return self._values
+
+    def with_deltas(self, deltas, ceiling: float = 1.0) -> "PrimitiveVector":
+        """
+        New vector with `deltas` added element-wise and capped at `ceiling`.
+        `deltas` is a sequence in PRIMITIVE_NAMES order or a {name: delta} dict.
+        """
+        if isinstance(deltas, Mapping):
+            d = [0.0] * len(PRIMITIVE_NAMES)
+            for name, delta in deltas.items():
+                d[PRIMITIVE_INDEX[name]] = delta
+            deltas = d
+        return PrimitiveVector(min(ceiling, v + d) for v, d in zip(self._values, deltas))
+
+    def delta_from(self, base: "PrimitiveVector") -> list:
+        """Element-wise self - base, in PRIMITIVE_NAMES order."""
+        return [v - b for v, b in zip(self._values, base._values)]
+
+    def replace(self, **updates) -> "PrimitiveVector":
+        values = array("d", self._values)
+        for name, val in updates.items():
+            values[PRIMITIVE_INDEX[name]] = val
+        return PrimitiveVector(values)
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# PHRASE RULES  —  matcher, streaming check, batch scoring, eval memo
+# ═══════════════════════════════════════════════════════════════════════════
+
+# Same phrase lists as evaluate.ts; each evaluate() rubric weighs them its own way
+BANNED_PRODUCTS = [
+    "gpt-5","gpt-6","gpt-7","gpt-8","gpt-9","gpt-10",
+    "llama 4","llama 5","llama 6","claude 5","claude 6",
+]
+HYPERBOLE_WORDS = [
+    "revolutionary","earth-shattering","unprecedented",
+    "game-changing","breakthrough","incredible",
+    "amazing","absolutely","unbelievable",
+]
+SOURCE_MARKERS = [
+    "according to","reported by","sources say",
+    "january","february","march","april","may","june",
+    "july","august","september","october","november","december",
+]
+VAGUE_TEMPORAL = ["recently","lately","soon","the other day"]
+BULLET_MARKERS = ["bullet 1","bullet 2"]
+
+
+class PhraseMatcher:
+    """
+    Substring matcher: `scan(t)` == {p for p in phrases if p in t} exactly.
+
+    Below REGEX_MIN_PHRASES that is what it runs — CPython's `in` is a C
+    fast-search, and at the evaluator's ~40 phrases the per-phrase loop
+    beats any single pattern (0.13 s vs 0.20 s over 5k 730-char drafts).
+    From there on the phrases are folded into a prefix trie and emitted
+    as one regex, so the engine rejects most offsets on the first
+    character and the cost stops growing with the phrase count (a tie at
+    ~160 phrases, 3x faster at 640).  After each regex hit the search
+    resumes one character past its start (overlapping hits are kept), and
+    phrases that are substrings of a longer matched phrase are added back
+    via a containment table built up front.  `use_regex` forces a path.
+    """
+
+    REGEX_MIN_PHRASES = 160
+
+    def __init__(self, phrases: list[str], use_regex: bool | None = None):
+        self.phrases = list(dict.fromkeys(phrases))
+        if use_regex is None:
+            use_regex = len(self.phrases) >= self.REGEX_MIN_PHRASES
+        self._contains = {p: frozenset(q for q in self.phrases if q in p)
+                          for p in self.phrases}
+        self._regex = re.compile(self._trie_pattern(self.phrases)) if use_regex else None
+
+    @staticmethod
+    def _trie_pattern(phrases: list[str]) -> str:
+        trie: dict = {}
+        for p in phrases:
+            node = trie
+            for ch in p:
+                node = node.setdefault(ch, {})
+            node[""] = {}                       # end-of-phrase marker
+
+        def emit(node: dict) -> str:
+            alts, optional = [], "" in node
+            for ch in sorted(k for k in node if k):
+                alts.append(re.escape(ch) + emit(node[ch]))
+            if not alts:
+                return ""
+            body = alts[0] if len(alts) == 1 and not optional else f"(?:{'|'.join(alts)})"
+            # greedy `?` tries the longer phrase before settling on this one
+            return f"{body}?" if optional else body
+
+        return emit(trie)
+
+    def scan(self, lower: str) -> set[str]:
+        if self._regex is None:
+            return {p for p in self.phrases if p in lower}
+        hits: set[str] = set()
+        search = self._regex.search
+        m = search(lower)
+        while m:
+            hits |= self._contains[m.group()]
+            m = search(lower, m.start() + 1)
+        return hits
+
+    def hit_matrix(self, lowers: list[str]) -> np.ndarray:
+        """
+        Batch form of `scan`: a bool array of shape
+        (len(lowers), len(self.phrases)).  The regex path makes one pass
+        over all texts joined by NUL (no phrase contains it).
+        """
+        import numpy as np
+
+        if self._regex is None:
+            return np.fromiter((p in t for t in lowers for p in self.phrases), dtype=bool,
+                               count=len(lowers) * len(self.phrases)
+                               ).reshape(len(lowers), len(self.phrases))
+
+        col = {p: i for i, p in enumerate(self.phrases)}
+        contains = np.zeros((len(self.phrases), len(self.phrases)), dtype=np.uint8)
+        for p, qs in self._contains.items():
+            contains[col[p], [col[q] for q in qs]] = 1
+
+        lengths = np.fromiter((len(t) + 1 for t in lowers), dtype=np.int64,
+                              count=len(lowers))
+        starts  = np.cumsum(lengths) - lengths
+        corpus  = "\0".join(lowers)
+        offsets, matched = [], []
+        search = self._regex.search
+        m = search(corpus)
+        while m:
+            offsets.append(m.start())
+            matched.append(col[m.group()])
+            m = search(corpus, m.start() + 1)
+
+        direct = np.zeros((len(lowers), len(self.phrases)), dtype=np.uint8)
+        rows = np.searchsorted(starts, np.asarray(offsets, dtype=np.int64), side="right") - 1
+        direct[rows, np.asarray(matched, dtype=np.int64)] = 1
+        return (direct @ contains) > 0
+
+
+MATCHER = PhraseMatcher(BANNED_PRODUCTS + HYPERBOLE_WORDS + SOURCE_MARKERS
+                        + VAGUE_TEMPORAL + BULLET_MARKERS)
+
+
+class StreamingEvaluator:
+    """
+    Incremental check of a streamed draft for the high-severity rule: an
+    unreleased product name, which every evaluate() rubric penalises as a
+    hallucination.  feed() rescans only the new tail plus enough overlap
+    to catch a phrase split across tokens, and returns True once a phrase
+    has fired (the first one is kept in `phrase` / `fired_at_token`).
+    """
+
+    _MATCHER = PhraseMatcher(BANNED_PRODUCTS)
+    _OVERLAP = max(len(p) for p in BANNED_PRODUCTS) - 1
+
+    def __init__(self):
+        self.lower  = ""
+        self.tokens = 0
+        self.phrase = None
+        self.fired_at_token = None
+
+    def feed(self, token: str) -> bool:
+        self.tokens += 1
+        start = max(0, len(self.lower) - self._OVERLAP)
+        self.lower += token.lower()
+        if self.phrase is None:
+            hits = self._MATCHER.scan(self.lower[start:])
+            if hits:
+                self.phrase = min(hits)
+                self.fired_at_token = self.tokens
+        return self.phrase is not None
+
+
+# Columns of the rule-hit matrix — the sidecar rubric's issues_by_type keys;
+# the circuit's rubric scores the first four
+RULE_TYPES = ["hallucination", "hyperbole", "missing_source",
+              "temporal_vague", "low_specificity"]
+
+
+def rule_hit_matrix(texts) -> np.ndarray:
+    """
+    Tokenize + match a list/iterator of texts in one pass.  Row i, column
+    j is how often rule RULE_TYPES[j] fires on texts[i] (0 when absent).
+    Independent of primitives, so a corpus only has to be matched once and
+    can be re-scored under any weights.
+    """
+    import numpy as np
+
+    texts   = list(texts)
+    hits    = MATCHER.hit_matrix([t.lower() for t in texts])
+    col     = {p: i for i, p in enumerate(MATCHER.phrases)}
+    n_words = np.fromiter((len(t.split()) for t in texts), dtype=np.int64,
+                          count=len(texts))
+
+    def cols(phrases):
+        return hits[:, [col[p] for p in phrases]]
+
+    rules = np.zeros((len(texts), len(RULE_TYPES)), dtype=np.int64)
+    rules[:, 0] = cols(BANNED_PRODUCTS).sum(axis=1)
+    rules[:, 1] = cols(HYPERBOLE_WORDS).sum(axis=1) >= 3
+    rules[:, 2] = ~cols(SOURCE_MARKERS).any(axis=1) & (n_words > 20)
+    rules[:, 3] = cols(VAGUE_TEMPORAL).any(axis=1)
+    rules[:, 4] = (n_words < 25) | cols(BULLET_MARKERS).all(axis=1)
+    return rules
+
+
+def rule_weights(primitives: dict) -> np.ndarray:
+    """Per-hit score deduction for each RULE_TYPES column."""
+    import numpy as np
+
+    return np.array([
+        30 * primitives.get("fact_verification", 0.65),
+        20 * primitives.get("anti_hyperbole", 0.75),
+        15 * primitives.get("source_attribution", 0.72),
+        10 * primitives.get("temporal_accuracy", 0.70),
+        8  * primitives.get("fact_verification", 0.65),
+    ], dtype=np.float64)
+
+
+def score_rule_hits(rules: np.ndarray, primitives: dict, gate_threshold: float,
+                    rule_types=RULE_TYPES) -> dict:
+    """
+    Vectorized scoring: rules @ weights, then the same clamp/gate as
+    evaluate().  `rule_types` picks the RULE_TYPES columns a rubric scores.
+    """
+    import numpy as np
+
+    cols   = [RULE_TYPES.index(t) for t in rule_types]
+    rules  = rules[:, cols]
+    raw    = np.clip(100.0 - rules @ rule_weights(primitives)[cols], 0.0, 100.0)
+    passed = (raw / 100.0) >= gate_threshold
+    return {
+        "score":          np.round(raw / 100.0, 4),
+        "passed":         passed,
+        "issues_count":   rules.sum(axis=1),
+        "issues_by_type": rules,
+        "rule_types":     list(rule_types),
+        "quality_band":   np.where(passed, "pass", np.where(raw >= 50, "warn", "fail")),
+    }
+
+
+def evaluate_many(texts, primitives: dict, gate_threshold: float,
+                  rule_types=RULE_TYPES) -> dict:
+    """
+    Batch form of evaluate() — one dict of NumPy arrays (one row per text)
+    instead of a list of dicts.  To re-score the same corpus under other
+    primitives, keep `rule_hit_matrix(texts)` and call `score_rule_hits`.
+    """
+    return score_rule_hits(rule_hit_matrix(texts), primitives, gate_threshold, rule_types)
+
+
+class EvalMemo:
+    """
+    Bounded LRU in front of a rubric's evaluate(text, primitives), keyed
+    by (text sha256, primitives_hash(primitives)).  Replays and re-scored
+    drafts under unchanged weights become dict lookups.  Cached results
+    are shared between callers — treat them as read-only.  Thread-safe.
+    """
+
+    def __init__(self, max_entries: int, evaluate):
+        from collections import OrderedDict
+
+        self.max_entries = max_entries
+        self._evaluate   = evaluate
+        self._entries    = OrderedDict()
+        self._lock       = threading.Lock()
+        self.hits = self.misses = 0
+
+    def evaluate(self, text: str, primitives: dict, stats: dict | None = None) -> dict:
+        """evaluate() through the memo; bumps stats["hits"|"misses"] if given."""
+        key = (hashlib.sha256(text.encode()).hexdigest()[:12], primitives_hash(primitives))
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        outcome = "hits"
+        if result is None:
+            outcome = "misses"
+            result  = self._evaluate(text, primitives)
+            with self._lock:
+                self.misses += 1
+                self._entries[key] = result
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        if stats is not None:
+            stats[outcome] = stats.get(outcome, 0) + 1
+        return result
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# RESILIENCE  —  retries, circuit breaker, adaptive limits, single-flight
+# ═══════════════════════════════════════════════════════════════════════════
+
+# Statuses worth another attempt; other 4xx won't change on retry
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+
+def retry_after_s(resp) -> float | None:
+    """Retry-After header (delta-seconds or HTTP-date) in seconds, if present."""
+    value = resp.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    from email.utils import parsedate_to_datetime
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class StreamError(RuntimeError):
+    """An `error` event inside a 200 text-generation-inference stream."""
+
+
+class RetryPolicy:
+    """Which HF failures are worth another attempt, and how long to wait first."""
+
+    def __init__(self, base_s: float, max_s: float):
+        self.base_s = base_s
+        self.max_s  = max_s
+
+    def backoff_s(self, attempt: int) -> float:
+        """Exponential backoff with full jitter for the retry after `attempt`."""
+        return random.uniform(0, min(self.max_s, self.base_s * 2 ** (attempt - 1)))
+
+    @staticmethod
+    def transient_errors() -> tuple:
+        """
+        Failures on the way to HF that another attempt may not hit: transport
+        errors, and errors TGI reports mid-stream after a 200.
+        """
+        import httpx
+
+        return (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError,
+                StreamError)
+
+    def upstream_fault(self, exc: Exception) -> bool:
+        """
+        True when HF (or the network to it) failed — a breaker failure.
+        Local errors (a malformed request, LocalProtocolError, …) would
+        fail the same way against a healthy upstream, so they are not.
+        """
+        import httpx
+
+        return isinstance(exc, (httpx.HTTPStatusError, *self.transient_errors()))
+
+    def plan(self, exc: Exception, attempt: int) -> tuple[float, bool] | None:
+        """
+        (delay_s, wait_for_model) for a retryable failure, None otherwise.
+        A 503 carrying HF's `estimated_time` means the model is loading: retry
+        at once with options.wait_for_model so HF holds the request until the
+        model is up, instead of polling it.
+        """
+        resp = getattr(exc, "response", None)
+        if resp is None:
+            return (self.backoff_s(attempt), False) if isinstance(exc, self.transient_errors()) else None
+        if resp.status_code not in RETRYABLE_STATUS:
+            return None
+        if resp.status_code == 503:
+            try:
+                body = resp.json()
+            except ValueError:
+                body = None
+            if isinstance(body, dict) and "estimated_time" in body:
+                return 0.0, True
+        after = retry_after_s(resp)
+        return (after if after is not None else self.backoff_s(attempt)), False
+
+
+class CircuitBreaker:
+    """
+    Closed → open once the failure rate over the last `window_s` seconds
+    reaches `failure_rate` (with at least `min_calls` calls in the window).
+    Open → half-open after `cooldown_s`: the next call is a probe, and its
+    outcome closes the breaker or re-opens it for another cool-down.
+    While open (or while the probe is out) allow() is False and callers
+    serve their fallback without touching the network.  Thread-safe.
+    """
+
+    def __init__(self, name: str, window_s: float, min_calls: int,
+                 failure_rate: float, cooldown_s: float):
+        from collections import deque
+
+        self.name         = name
+        self.window_s     = window_s
+        self.min_calls    = min_calls
+        self.failure_rate = failure_rate
+        self.cooldown_s   = cooldown_s
+        self.state        = "closed"
+        self._calls       = deque()         # (monotonic ts, ok) inside the window
+        self._failures    = 0
+        self._opened_at   = 0.0
+        self._probing     = False
+        self._lock        = threading.Lock()
+        self.opened = self.rejected = 0
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self._opened_at < self.cooldown_s:
+                    self.rejected += 1
+                    return False
+                self.state    = "half_open"
+                self._probing = False
+            if self.state == "half_open":
+                if self._probing:
+                    self.rejected += 1
+                    return False
+                self._probing = True
+            return True
+
+    def record(self, ok: bool):
+        now = time.monotonic()
+        with self._lock:
+            if self.state == "half_open":
+                self._probing = False
+                if ok:
+                    self.state = "closed"
+                    self._calls.clear()
+                    self._failures = 0
+                else:
+                    self._open(now)
+                return
+            if self.state == "open":        # straggler from before it tripped
+                return
+            self._calls.append((now, ok))
+            self._failures += not ok
+            self._prune(now)
+            n = len(self._calls)
+            if n >= self.min_calls and self._failures / n >= self.failure_rate:
+                self._open(now)
+
+    def release(self):
+        """An allowed call that never reached the upstream: no outcome, but free the probe slot."""
+        with self._lock:
+            if self.state == "half_open":
+                self._probing = False
+
+    def _prune(self, now: float):
+        while self._calls and now - self._calls[0][0] > self.window_s:
+            _, ok = self._calls.popleft()
+            self._failures -= not ok
+
+    def _open(self, now: float):
+        self.state      = "open"
+        self._opened_at = now
+        self._calls.clear()
+        self._failures  = 0
+        self.opened    += 1
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now)
+            n = len(self._calls)
+            return {
+                "name":         self.name,
+                "state":        self.state,
+                "failure_rate": round(self._failures / n, 3) if n else 0.0,
+                "window_calls": n,
+                "retry_in_s":   (round(max(0.0, self.cooldown_s - (now - self._opened_at)), 3)
+                                 if self.state == "open" else 0.0),
+                "opened":       self.opened,
+                "rejected":     self.rejected,
+            }
+
+
+class _AIMDLimit:
+    """
+    AIMD concurrency limit for calls to one endpoint, after Netflix's
+    concurrency-limits.  The no-load latency baseline is the lowest latency
+    seen, drifting up slowly so a slower model doesn't pin it.  A success
+    within `tolerance` × baseline while the limit is in use grows the limit
+    by 1/limit (about +1 per limit's worth of calls); a 429/503, an error or
+    a latency above that cuts it by `backoff`.  Callers over the limit
+    queue in acquire() — see AdaptiveLimiter / AsyncAdaptiveLimiter.
+    """
+
+    def __init__(self, initial: float, min_limit: int, max_limit: int,
+                 tolerance: float, backoff: float = 0.9):
+        self.limit      = float(min(max(initial, min_limit), max_limit))
+        self.min_limit  = min_limit
+        self.max_limit  = max_limit
+        self.tolerance  = tolerance
+        self.backoff    = backoff
+        self.in_flight  = 0
+        self.waiting    = 0
+        self.baseline_ms = None
+        self.queue_wait_ms = 0.0                # EWMA
+        self.drops = 0
+
+    def _admitted(self, t0: float) -> float:
+        self.in_flight += 1
+        waited_ms = (time.perf_counter() - t0) * 1000
+        self.queue_wait_ms += 0.2 * (waited_ms - self.queue_wait_ms)
+        return waited_ms
+
+    def _sample(self, latency_ms: float | None, overloaded: bool):
+        """One call finished: adjust the limit (caller holds the condition)."""
+        in_use = self.in_flight * 2 >= self.limit
+        self.in_flight -= 1
+        if latency_ms is None and not overloaded:
+            return
+        if not overloaded:
+            if self.baseline_ms is None or latency_ms < self.baseline_ms:
+                self.baseline_ms = latency_ms
+            else:
+                self.baseline_ms += 0.01 * (latency_ms - self.baseline_ms)
+            overloaded = latency_ms > self.baseline_ms * self.tolerance
+        if overloaded:
+            self.drops += 1
+            self.limit = max(float(self.min_limit), self.limit * self.backoff)
+        elif in_use:
+            self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+
+    def snapshot(self) -> dict:
+        return {"limit":         round(self.limit, 2),
+                "in_flight":     self.in_flight,
+                "waiting":       self.waiting,
+                "queue_wait_ms": round(self.queue_wait_ms, 1),
+                "baseline_ms":   round(self.baseline_ms or 0.0, 1),
+                "drops":         self.drops}
+
+
+class AdaptiveLimiter(_AIMDLimit):
+    """_AIMDLimit for threads: acquire() blocks on a threading.Condition."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout: float | None = None) -> float:
+        """Block until under the limit; returns ms spent queued."""
+        t0 = time.perf_counter()
+        with self._cond:
+            self.waiting += 1
+            try:
+                if not self._cond.wait_for(lambda: self.in_flight < int(self.limit), timeout):
+                    raise TimeoutError(f"limiter queue wait exceeded {timeout:.1f}s "
+                                       f"(limit {int(self.limit)})")
+            finally:
+                self.waiting -= 1
+            return self._admitted(t0)
+
+    def release(self, latency_ms: float | None, overloaded: bool):
+        """latency_ms=None: no latency sample (e.g. a stream we cut short)."""
+        with self._cond:
+            self._sample(latency_ms, overloaded)
+            self._cond.notify_all()
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return super().snapshot()
+
+
+class AsyncAdaptiveLimiter(_AIMDLimit):
+    """_AIMDLimit for one event loop: acquire() awaits an asyncio.Condition."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cond = asyncio.Condition()
+
+    async def acquire(self, timeout: float | None = None) -> float:
+        """Wait until under the limit; returns ms spent queued."""
+        t0 = time.perf_counter()
+        async with self._cond:
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(
+                    self._cond.wait_for(lambda: self.in_flight < int(self.limit)), timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"limiter queue wait exceeded {timeout:.1f}s "
+                                   f"(limit {int(self.limit)})") from None
+            finally:
+                self.waiting -= 1
+            return self._admitted(t0)
+
+    async def release(self, latency_ms: float | None, overloaded: bool):
+        """latency_ms=None: no latency sample (e.g. a stream we cut short)."""
+        async with self._cond:
+            self._sample(latency_ms, overloaded)
+            self._cond.notify_all()
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls with the same key into one: the first caller
+    (the leader) runs fn, later callers block until it finishes and share
+    its result.  The key is dropped as soon as the leader returns, so this
+    only dedupes calls that overlap in time — a GenerationCache covers the
+    rest.  Thread-safe.
+    """
+
+    class _Call:
+        __slots__ = ("done", "result", "error", "waiters")
+
+        def __init__(self):
+            self.done    = threading.Event()
+            self.result  = None
+            self.error   = None
+            self.waiters = 0
+
+    def __init__(self):
+        self._calls: dict[str, SingleFlight._Call] = {}
+        self._lock  = threading.Lock()
+        self.leaders = self.coalesced = 0
+
+    def do(self, key: str, fn, timeout: float | None = None) -> tuple[object, bool]:
+        """Returns (result, shared); raises TimeoutError if a follower outwaits `timeout`."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = SingleFlight._Call()
+                self.leaders += 1
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+        if leader:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+                raise
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+            return call.result, False
+        if not call.done.wait(timeout):
+            raise TimeoutError("coalesced call still in flight at deadline")
+        if call.error is not None:
+            raise call.error
+        return call.result, True
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"leaders": self.leaders, "coalesced": self.coalesced,
+                    "in_flight": len(self._calls)}
+
+
+class AsyncSingleFlight:
+    """
+    SingleFlight for one event loop: the first caller awaits factory(),
+    later callers await its future and share the result.
+    """
+
+    def __init__(self):
+        self._calls: dict[str, asyncio.Future] = {}
+        self.leaders = self.coalesced = 0
+
+    async def do(self, key: str, factory, timeout: float | None = None) -> tuple[object, bool]:
+        """Returns (result, shared); raises TimeoutError if a follower outwaits `timeout`."""
+        future = self._calls.get(key)
+        if future is not None:
+            self.coalesced += 1
+            try:
+                # shield: a follower giving up must not cancel the leader's call
+                return await asyncio.wait_for(asyncio.shield(future), timeout), True
+            except asyncio.TimeoutError:
+                raise TimeoutError("coalesced call still in flight at deadline") from None
+
+        self.leaders += 1
+        future = self._calls[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await factory()
+            future.set_result(result)
+            return result, False
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()          # retrieved: no "never retrieved" warning without followers
+            raise
+        finally:
+            del self._calls[key]
+
+    def stats(self) -> dict:
+        return {"leaders": self.leaders, "coalesced": self.coalesced,
+                "in_flight": len(self._calls)}
+
+
+class GenerationCache:
+    """
+    Content-addressed cache for successful generations, keyed on
+    (model, prompt_hash, temperature, max_new_tokens).  An in-process LRU
+    with per-entry TTL, optionally backed by a SQLite file (WAL) so repeat
+    soak runs hit across restarts.  SQLite is never touched under the LRU
+    lock: put() queues the row and a writer thread commits the queue in one
+    transaction every `flush_s` (and at exit); a miss reads through a
+    per-thread connection.  Thread-safe.
+    """
+
+    def __init__(self, max_entries: int, ttl_s: float, path: str = "", flush_s: float = 0.5):
+        from collections import OrderedDict
+
+        self.max_entries = max_entries
+        self.ttl_s       = ttl_s
+        self.path        = path
+        self.flush_s     = flush_s
+        self._entries    = OrderedDict()        # key → (expires_at, value)
+        self._lock       = threading.Lock()
+        self._local      = threading.local()    # per thread: SQLite connection
+        self._pending    = []                   # rows put() but not yet committed
+        self._writer     = None
+        self.hits = self.misses = 0
+        if path:
+            db = self._conn()
+            db.execute("CREATE TABLE IF NOT EXISTS gen_cache "
+                       "(key TEXT PRIMARY KEY, value TEXT, expires_at REAL)")
+            db.commit()
+
+    @staticmethod
+    def key(model: str, prompt_hash: str, temperature: float, max_new_tokens: int) -> str:
+        return f"{model}|{prompt_hash}|{temperature}|{max_new_tokens}"
+
+    def _conn(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            import sqlite3
+            db = self._local.db = sqlite3.connect(self.path, timeout=5.0)
+            db.execute("PRAGMA journal_mode=WAL")
+        return db
+
+    def get(self, key: str) -> dict | None:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+        if self.path:
+            row = self._conn().execute("SELECT value, expires_at FROM gen_cache "
+                                       "WHERE key = ? AND expires_at > ?", (key, now)).fetchone()
+            if row:
+                entry = (row[1], json.loads(row[0]))
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self._insert(key, entry)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, value: dict):
+        entry = (time.time() + self.ttl_s, value)
+        row   = (key, json.dumps(value), entry[0]) if self.path else None
+        with self._lock:
+            self._insert(key, entry)
+            if row is None:
+                return
+            self._pending.append(row)
+            if self._writer is None:
+                import atexit
+
+                self._writer = threading.Thread(target=self._write_loop, daemon=True,
+                                                name="gen-cache-writer")
+                self._writer.start()
+                atexit.register(self.flush)
+
+    def flush(self):
+        """Commit every queued row in one transaction (the writer does this each flush_s)."""
+        with self._lock:
+            rows, self._pending = self._pending, []
+        if rows:
+            db = self._conn()
+            db.executemany("INSERT OR REPLACE INTO gen_cache VALUES (?, ?, ?)", rows)
+            db.commit()
+
+    def _write_loop(self):
+        while True:
+            time.sleep(self.flush_s)
+            try:
+                self.flush()
+            except Exception as e:      # a locked/unwritable file must not kill the writer
+                print(f"  ⚠️  generation cache: SQLite write failed: {e}")
+
+    def _insert(self, key: str, entry: tuple):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# PRIMITIVES STORE  —  versioned learned weights, CAS + merge on conflict
+# ═══════════════════════════════════════════════════════════════════════════
+
+class PrimitivesStore(ABC):
+    """
+    Monotonically versioned snapshots of the primitives vector.
+
+    latest() → (vector, version) is the hot path and takes no lock.
+    compare_and_swap(version, vector) installs `vector` as version + 1
+    only while `version` is still the latest.  commit() is how learners
+    write: an episode that started from (base, base_version) and learned
+    `learned` swaps it in if nobody committed meanwhile; otherwise it
+    re-applies its own delta onto the newer snapshot (merge on conflict)
+    and tries again.  Episodes therefore never hold a lock while they run,
+    and concurrent learning adds up instead of the last writer winning.
+    """
+
+    backend      = "base"
+    max_attempts = 32
+
+    def __init__(self):
+        self.commits = self.conflicts = 0
+
+    @abstractmethod
+    def latest(self) -> tuple[PrimitiveVector, int]:
+        """The newest (vector, version) snapshot."""
+
+    @abstractmethod
+    def compare_and_swap(self, version: int, vector: PrimitiveVector) -> int | None:
+        """New version, or None if `version` is no longer the latest."""
+
+    def commit(self, base: PrimitiveVector, base_version: int | None,
+               learned: PrimitiveVector) -> dict:
+        """
+        Fold `learned` (trained from `base` at `base_version`) into the
+        store.  base_version=None means "caller's own weights" — the delta
+        is merged onto the latest snapshot.
+        """
+        deltas = learned.delta_from(base)
+        if not any(deltas):
+            return {"committed": False, "base_version": base_version,
+                    "version": self.latest()[1], "conflicts": 0}
+        current, version = (base, base_version) if base_version is not None else self.latest()
+        for attempt in range(self.max_attempts):
+            candidate = learned if version == base_version else current.with_deltas(deltas)
+            new_version = self.compare_and_swap(version, candidate)
+            if new_version is not None:
+                self.commits   += 1
+                self.conflicts += attempt
+                return {"committed": True, "base_version": base_version,
+                        "version": new_version, "conflicts": attempt}
+            current, version = self.latest()
+        print(f"  ⚠️  primitives commit gave up after {self.max_attempts} conflicts")
+        return {"committed": False, "base_version": base_version,
+                "version": version, "conflicts": self.max_attempts}
+
+    def stats(self) -> dict:
+        vector, version = self.latest()
+        return {"backend": self.backend, "version": version, "values": vector.to_dict(),
+                "commits": self.commits, "conflicts": self.conflicts}
+
+    def close(self):
+        pass
+
+
+class MemoryPrimitivesStore(PrimitivesStore):
+    """One process: latest() is a single attribute read; CAS under a short lock."""
+
+    backend = "memory"
+
+    def __init__(self, initial=None):
+        super().__init__()
+        self._latest = (PrimitiveVector.from_mapping(initial or DEFAULT_PRIMITIVES), 1)
+        self._lock   = threading.Lock()
+
+    def latest(self) -> tuple[PrimitiveVector, int]:
+        return self._latest
+
+    def compare_and_swap(self, version: int, vector: PrimitiveVector) -> int | None:
+        with self._lock:
+            if self._latest[1] != version:
+                return None
+            self._latest = (vector, version + 1)
+            return version + 1
+
+
+class SQLitePrimitivesStore(PrimitivesStore):
+    """
+    Durable and shared by every process on the host: one row per version.
+    The CAS reads MAX(version) and inserts version + 1 inside one
+    BEGIN IMMEDIATE transaction, so it only succeeds from the latest
+    version and writers on other connections wait their turn.  Each
+    thread keeps its own connection and last snapshot, and re-reads only
+    when PRAGMA data_version says another connection committed — so
+    latest() is one cheap pragma, no lock, no JSON.
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, path: str, initial=None):
+        super().__init__()
+        self.path   = path
+        self._local = threading.local()
+        db = self._conn()
+        db.execute("CREATE TABLE IF NOT EXISTS primitives_snapshots "
+                   "(version INTEGER PRIMARY KEY, primitives TEXT NOT NULL, created_at REAL)")
+        db.execute("INSERT OR IGNORE INTO primitives_snapshots VALUES (1, ?, ?)",
+                   (json.dumps(PrimitiveVector.from_mapping(initial or DEFAULT_PRIMITIVES)
+                               .to_dict()), time.time()))
+        db.commit()
+
+    def _conn(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            import sqlite3
+            db = self._local.db = sqlite3.connect(self.path, timeout=5.0)
+            db.execute("PRAGMA journal_mode=WAL")
+            self._local.data_version, self._local.latest = None, None
+        return db
+
+    def latest(self) -> tuple[PrimitiveVector, int]:
+        db    = self._conn()
+        local = self._local
+        data_version = db.execute("PRAGMA data_version").fetchone()[0]
+        if local.latest is None or data_version != local.data_version:
+            version, primitives = db.execute(
+                "SELECT version, primitives FROM primitives_snapshots "
+                "ORDER BY version DESC LIMIT 1").fetchone()
+            local.latest       = (PrimitiveVector.from_mapping(json.loads(primitives)), version)
+            local.data_version = data_version
+        return local.latest
+
+    def compare_and_swap(self, version: int, vector: PrimitiveVector) -> int | None:
+        import sqlite3
+
+        db = self._conn()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            (newest,) = db.execute("SELECT MAX(version) FROM primitives_snapshots").fetchone()
+            if newest != version:
+                db.rollback()
+                return None
+            db.execute("INSERT INTO primitives_snapshots VALUES (?, ?, ?)",
+                       (version + 1, json.dumps(vector.to_dict()), time.time()))
+            db.commit()
+        except sqlite3.IntegrityError:
+            db.rollback()
+            return None
+        except BaseException:
+            db.rollback()
+            raise
+        self._local.latest = None   # our own commit does not move data_version
+        return version + 1
@@ -0,0 +1,408 @@
+"""
+Tests for newsroom_core: primitive vectors, phrase matcher, retry policy,
+circuit breaker, adaptive limiter, single-flight, generation cache.
+"""
+
+import asyncio, random, string, threading, time
+
+import httpx
+import pytest
+
+from newsroom_core import (DEFAULT_PRIMITIVES, MATCHER, AdaptiveLimiter, AsyncAdaptiveLimiter,
+                           AsyncSingleFlight, CircuitBreaker, GenerationCache, PhraseMatcher,
+                           PrimitiveVector, RetryPolicy, SingleFlight, primitives_hash)
+
+
+def random_texts(phrases, n, seed=0):
+    """Texts built from phrases, their fragments, overlaps and noise."""
+    rng = random.Random(seed)
+    pieces = list(phrases) + [p[:rng.randint(1, len(p))] for p in phrases] + \
+             ["mayor", "gpt-100", "soonish", "bullet 12", "according", " ", "-", "\n"]
+    out = []
+    for _ in range(n):
+        parts = []
+        for _ in range(rng.randint(0, 40)):
+            if rng.random() < 0.6:
+                parts.append(rng.choice(pieces))
+            else:
+                parts.append("".join(rng.choice(string.ascii_lowercase + " -")
+                                     for _ in range(rng.randint(1, 8))))
+        out.append(rng.choice(["", " "]).join(parts))
+    return out
+
+
+# ── PrimitiveVector ──────────────────────────────────────────────────────────
+
+def test_vector_equals_the_equivalent_dict():
+    p = PrimitiveVector()
+    assert p == DEFAULT_PRIMITIVES and DEFAULT_PRIMITIVES == p
+    assert p == PrimitiveVector.from_mapping(dict(DEFAULT_PRIMITIVES))
+    assert p != {**DEFAULT_PRIMITIVES, "brevity": 0.5}
+    assert p != {k: v for k, v in DEFAULT_PRIMITIVES.items() if k != "brevity"}
+    assert p.replace(brevity=0.5) == {**DEFAULT_PRIMITIVES, "brevity": 0.5}
+
+
+def test_equal_vectors_hash_alike_and_digest_matches_primitives_hash():
+    a = PrimitiveVector()
+    b = PrimitiveVector.from_mapping(dict(DEFAULT_PRIMITIVES))
+    assert a is not b and hash(a) == hash(b) and len({a, b}) == 1
+    assert a.digest == primitives_hash(DEFAULT_PRIMITIVES) == primitives_hash(a)
+    changed = a.with_deltas({"brevity": 0.1})
+    assert changed.digest == primitives_hash(changed.to_dict()) != a.digest
+
+    zero, negative_zero = a.replace(brevity=0.0), a.replace(brevity=-0.0)
+    assert zero == negative_zero and hash(zero) == hash(negative_zero)
+
+
+def test_with_deltas_builds_a_new_vector_and_caps():
+    p = PrimitiveVector()
+    q = p.with_deltas({"anti_hyperbole": 0.5, "brevity": -0.1})
+    assert p == DEFAULT_PRIMITIVES                                  # untouched
+    assert q["anti_hyperbole"] == 1.0 and q["brevity"] == pytest.approx(0.3)
+    assert q.delta_from(p) == pytest.approx([0, 0.25, 0, 0, 0, -0.1])
+    assert p.with_deltas(q.delta_from(p)) == q
+
+
+# ── PhraseMatcher ────────────────────────────────────────────────────────────
+
+def test_matcher_uses_substring_search_below_the_threshold():
+    assert len(MATCHER.phrases) < PhraseMatcher.REGEX_MIN_PHRASES
+    assert MATCHER._regex is None
+    many = [f"phrase {i}" for i in range(PhraseMatcher.REGEX_MIN_PHRASES)]
+    assert PhraseMatcher(many)._regex is not None
+
+
+@pytest.mark.parametrize("use_regex", [False, True])
+def test_scan_matches_the_per_phrase_check(use_regex):
+    matcher = PhraseMatcher(MATCHER.phrases, use_regex=use_regex)
+    for text in random_texts(matcher.phrases, 3000, seed=int(use_regex)):
+        assert matcher.scan(text) == {p for p in matcher.phrases if p in text}, text
+
+
+@pytest.mark.parametrize("use_regex", [False, True])
+def test_hit_matrix_matches_scan(use_regex):
+    matcher = PhraseMatcher(MATCHER.phrases, use_regex=use_regex)
+    texts = random_texts(matcher.phrases, 500, seed=7) + [""]
+    matrix = matcher.hit_matrix(texts)
+    assert matrix.shape == (len(texts), len(matcher.phrases))
+    for row, text in zip(matrix, texts):
+        assert {p for p, hit in zip(matcher.phrases, row) if hit} == matcher.scan(text)
+
+
+# ── RetryPolicy ──────────────────────────────────────────────────────────────
+
+REQUEST = httpx.Request("POST", "https://hf.example/models/m")
+
+
+def _status_error(code: int, headers=None, json=None) -> httpx.HTTPStatusError:
+    resp = httpx.Response(code, headers=headers, json=json, request=REQUEST)
+    return httpx.HTTPStatusError(f"{code}", request=REQUEST, response=resp)
+
+
+@pytest.fixture
+def policy():
+    return RetryPolicy(base_s=0.5, max_s=8.0)
+
+
+@pytest.mark.parametrize("exc", [
+    httpx.ConnectTimeout("t"), httpx.ReadTimeout("t"), httpx.ConnectError("c"),
+    httpx.ReadError("r"), httpx.RemoteProtocolError("peer closed"),
+])
+def test_transient_transport_errors_are_retried(policy, exc):
+    delay, wait_for_model = policy.plan(exc, 1)
+    assert 0.0 <= delay <= 0.5 and not wait_for_model
+    assert policy.upstream_fault(exc)
+
+
+@pytest.mark.parametrize("exc", [
+    httpx.LocalProtocolError("Illegal header value b'Bearer '"),
+    httpx.UnsupportedProtocol("ftp"), ValueError("bad JSON"), KeyError("x"),
+])
+def test_local_errors_are_not_retried_nor_upstream_faults(policy, exc):
+    assert policy.plan(exc, 1) is None
+    assert not policy.upstream_fault(exc)
+
+
+def test_status_codes(policy):
+    assert policy.plan(_status_error(400), 1) is None
+    assert policy.plan(_status_error(429, headers={"Retry-After": "3"}), 1) == (3.0, False)
+    assert policy.plan(_status_error(503, json={"estimated_time": 20.0}), 1) == (0.0, True)
+    delay, _ = policy.plan(_status_error(502), 3)
+    assert 0.0 <= delay <= 2.0
+    assert policy.upstream_fault(_status_error(400))
+
+
+# ── CircuitBreaker ───────────────────────────────────────────────────────────
+
+@pytest.fixture
+def breaker():
+    return CircuitBreaker("hf", window_s=10.0, min_calls=4, failure_rate=0.5, cooldown_s=0.05)
+
+
+def _trip(breaker):
+    for ok in (True, False, True, False):
+        assert breaker.allow()
+        breaker.record(ok)
+
+
+def test_breaker_opens_on_failure_rate(breaker):
+    for ok in (True, False, True):
+        breaker.allow()
+        breaker.record(ok)
+    assert breaker.state == "closed"          # under min_calls
+    breaker.allow()
+    breaker.record(False)
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    assert breaker.snapshot()["rejected"] == 1
+
+
+def test_breaker_open_half_open_closed(breaker):
+    _trip(breaker)
+    time.sleep(0.06)
+    assert breaker.allow()                    # the probe
+    assert breaker.state == "half_open"
+    assert not breaker.allow()                # only one probe at a time
+    breaker.record(True)
+    assert breaker.state == "closed"
+    assert breaker.snapshot()["window_calls"] == 0
+
+
+def test_failed_probe_reopens(breaker):
+    _trip(breaker)
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record(False)
+    assert breaker.state == "open" and breaker.opened == 2
+    assert not breaker.allow()
+
+
+def test_released_probe_frees_the_slot(breaker):
+    _trip(breaker)
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.release()                         # local error: no verdict on the upstream
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    breaker.record(True)
+    assert breaker.state == "closed"
+
+
+def test_stragglers_while_open_are_ignored(breaker):
+    _trip(breaker)
+    breaker.record(True)
+    assert breaker.state == "open"
+
+
+# ── AdaptiveLimiter ──────────────────────────────────────────────────────────
+
+def _busy_round(limiter, latency_ms, overloaded=False):
+    """Fill every slot, then finish them all with the same outcome."""
+    n = int(limiter.limit)
+    for _ in range(n):
+        limiter.acquire(0)
+    for _ in range(n):
+        limiter.release(latency_ms, overloaded)
+
+
+def test_limiter_grows_while_busy_and_latency_stays_flat():
+    limiter = AdaptiveLimiter(4, 1, 8, tolerance=2.0)
+    _busy_round(limiter, 10.0)
+    assert 4.4 < limiter.limit < 4.6        # +1/limit for each call that finished with half in use
+    for _ in range(20):
+        _busy_round(limiter, 12.0)
+    assert limiter.limit == 8.0 and limiter.drops == 0      # capped at max_limit
+    assert 10.0 < limiter.snapshot()["baseline_ms"] < 12.0  # drifts slowly toward 12 ms
+
+
+def test_limiter_does_not_grow_while_idle():
+    limiter = AdaptiveLimiter(8, 1, 16, tolerance=2.0)
+    for _ in range(50):
+        limiter.acquire(0)
+        limiter.release(10.0, False)                        # 1 in flight of 8: not in use
+    assert limiter.limit == 8.0
+
+
+def test_limiter_cuts_back_on_latency_and_429s():
+    limiter = AdaptiveLimiter(10, 2, 16, tolerance=2.0)
+    limiter.acquire(0)
+    limiter.release(10.0, False)                            # baseline
+    limiter.acquire(0)
+    limiter.release(25.0, False)                            # > 2 × baseline
+    assert limiter.limit == pytest.approx(9.0) and limiter.drops == 1
+    for _ in range(30):
+        limiter.acquire(0)
+        limiter.release(10.0, True)                         # 429 / 503 / error
+    assert limiter.limit == 2.0 and limiter.drops == 31      # floored at min_limit
+
+
+def test_limiter_release_without_a_sample_only_frees_the_slot():
+    limiter = AdaptiveLimiter(2, 1, 4, tolerance=2.0)
+    _busy_round(limiter, None)
+    assert limiter.limit == 2.0 and limiter.in_flight == 0 and limiter.baseline_ms is None
+
+
+def test_limiter_queues_over_the_limit():
+    limiter = AdaptiveLimiter(1, 1, 4, tolerance=2.0)
+    limiter.acquire(0)
+    with pytest.raises(TimeoutError):
+        limiter.acquire(0.05)
+    waited = []
+    t = threading.Thread(target=lambda: waited.append(limiter.acquire(5)))
+    t.start()
+    time.sleep(0.05)
+    assert limiter.snapshot()["waiting"] == 1
+    limiter.release(10.0, False)
+    t.join(5)
+    assert waited and waited[0] >= 40 and limiter.in_flight == 1
+
+
+def test_async_limiter_grows_cuts_and_queues():
+    async def main():
+        limiter = AsyncAdaptiveLimiter(2, 1, 4, tolerance=2.0)
+        for _ in range(2):
+            await limiter.acquire(1)
+        with pytest.raises(TimeoutError):
+            await limiter.acquire(0.01)
+        for _ in range(2):
+            await limiter.release(10.0, False)
+        grown = limiter.limit
+        await limiter.acquire(1)
+        await limiter.release(10.0, True)
+        return grown, limiter.limit
+
+    grown, cut = asyncio.run(main())
+    assert grown == 2.5 and cut == pytest.approx(2.25)
+
+
+# ── SingleFlight ─────────────────────────────────────────────────────────────
+
+def _followers(flight, key, n, fn, timeout=None):
+    """Start a leader running `fn`, then `n` followers; returns their outcomes."""
+    outcomes = [None] * (n + 1)
+
+    def call(i):
+        try:
+            outcomes[i] = ("ok", flight.do(key, fn, timeout))
+        except Exception as e:
+            outcomes[i] = ("error", e)
+
+    leader = threading.Thread(target=call, args=(0,))
+    leader.start()
+    while flight.stats()["in_flight"] == 0:
+        time.sleep(0.001)
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(1, n + 1)]
+    for t in threads:
+        t.start()
+    for t in [leader, *threads]:
+        t.join()
+    return outcomes
+
+
+def test_single_flight_shares_the_leaders_result():
+    flight, runs = SingleFlight(), []
+
+    def fn():
+        runs.append(1)
+        time.sleep(0.1)
+        return "text"
+
+    outcomes = _followers(flight, "k", 3, fn)
+    assert runs == [1]
+    assert outcomes[0] == ("ok", ("text", False))
+    assert all(o == ("ok", ("text", True)) for o in outcomes[1:])
+    assert flight.stats() == {"leaders": 1, "coalesced": 3, "in_flight": 0}
+
+
+def test_single_flight_leader_failure_reaches_every_follower():
+    flight = SingleFlight()
+
+    def fn():
+        time.sleep(0.1)
+        raise httpx.ReadTimeout("upstream")
+
+    outcomes = _followers(flight, "k", 2, fn)
+    assert all(kind == "error" and isinstance(e, httpx.ReadTimeout) for kind, e in outcomes)
+    assert flight.do("k", lambda: "fresh") == ("fresh", False)     # key was released
+
+
+def test_single_flight_follower_timeout_leaves_the_leader_running():
+    flight, gate = SingleFlight(), threading.Event()
+
+    def fn():
+        gate.wait(2)
+        return "late"
+
+    leader = threading.Thread(target=flight.do, args=("k", fn))
+    leader.start()
+    while flight.stats()["in_flight"] == 0:
+        time.sleep(0.001)
+    with pytest.raises(TimeoutError):
+        flight.do("k", fn, timeout=0.05)
+    gate.set()
+    leader.join()
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_async_single_flight_leader_failure_and_timeout():
+    async def scenario():
+        flight = AsyncSingleFlight()
+        release = asyncio.Event()
+
+        async def failing():
+            await release.wait()
+            raise httpx.ConnectError("down")
+
+        leader = asyncio.create_task(flight.do("k", failing))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("k", failing))
+        with pytest.raises(TimeoutError):
+            await flight.do("k", failing, timeout=0.01)
+        release.set()
+        for task in (leader, follower):
+            with pytest.raises(httpx.ConnectError):
+                await task
+        assert flight.stats() == {"leaders": 1, "coalesced": 2, "in_flight": 0}
+
+    asyncio.run(scenario())
+
+
+# ── GenerationCache ──────────────────────────────────────────────────────────
+
+def test_cache_lru_and_ttl():
+    cache = GenerationCache(max_entries=2, ttl_s=60)
+    cache.put("a", {"text": "A"})
+    cache.put("b", {"text": "B"})
+    assert cache.get("a") == {"text": "A"}
+    cache.put("c", {"text": "C"})                   # evicts b, the least recently used
+    assert cache.get("b") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    expired = GenerationCache(max_entries=2, ttl_s=-1)
+    expired.put("a", {"text": "A"})
+    assert expired.get("a") is None
+
+
+def test_cache_writes_sqlite_in_batches_off_the_lock(tmp_path):
+    path  = str(tmp_path / "gen_cache.sqlite3")
+    cache = GenerationCache(max_entries=10, ttl_s=60, path=path, flush_s=60)
+    for i in range(3):
+        cache.put(f"k{i}", {"text": f"T{i}"})
+    assert len(cache._pending) == 3                 # queued, not yet committed
+    assert GenerationCache(10, 60, path).get("k0") is None
+    cache.flush()
+    assert cache._pending == []
+    reopened = GenerationCache(10, 60, path)        # e.g. the next soak run
+    assert reopened.get("k2") == {"text": "T2"}
+    assert reopened.get("k2") == {"text": "T2"}     # now from the LRU
+    assert (reopened.hits, reopened.misses) == (2, 0)
+
+
+def test_cache_writer_thread_flushes(tmp_path):
+    path  = str(tmp_path / "gen_cache.sqlite3")
+    cache = GenerationCache(max_entries=10, ttl_s=60, path=path, flush_s=0.01)
+    cache.put("k", {"text": "T"})
+    reader, deadline = GenerationCache(10, 60, path), time.monotonic() + 2
+    while reader.get("k") is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert reader.get("k") == {"text": "T"}
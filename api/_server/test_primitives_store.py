@@ -0,0 +1,224 @@
+"""Tests for the primitives stores: seqlock reads, CAS conflicts and merges."""
+
+import multiprocessing, threading
+
+import pytest
+
+import wandb_sidecar as sc
+from newsroom_core import (PRIMITIVE_NAMES, PrimitiveVector, PrimitivesStore,
+                           MemoryPrimitivesStore, SQLitePrimitivesStore)
+
+
+@pytest.fixture
+def shared():
+    store = sc.SharedPrimitives.create(multiprocessing.Lock())
+    store.spin_s = store.lock_timeout_s = 0.2
+    yield store
+    store.close()
+
+
+# ── SharedPrimitives seqlock ─────────────────────────────────────────────────
+
+def _bump_all(process_lock, shm_name, rounds):
+    # Every write sets all weights to the same value: a torn read would mix two
+    writer = sc.SharedPrimitives.attach(shm_name, process_lock)
+    try:
+        for _ in range(rounds):
+            _, version = writer.latest()
+            writer.compare_and_swap(version, PrimitiveVector([float(version + 1)] * len(PRIMITIVE_NAMES)))
+    finally:
+        writer.close()
+
+
+def test_seqlock_reads_are_never_torn_under_a_concurrent_writer(shared):
+    shared.compare_and_swap(1, PrimitiveVector([2.0] * len(PRIMITIVE_NAMES)))   # version 2
+    # fork: the child inherits the weave stand-in from conftest
+    writer = multiprocessing.get_context("fork").Process(
+        target=_bump_all, args=(shared.lock, shared.name, 2000))
+    writer.start()
+    seen = 0
+    while writer.is_alive() or seen == 0:
+        vector, version = shared.latest()
+        assert len(set(vector.as_array())) == 1, vector
+        assert vector.as_array()[0] == float(version)
+        seen += 1
+    writer.join()
+    assert writer.exitcode == 0
+    assert shared.latest()[1] == 2002
+
+
+def test_reader_times_out_on_a_stuck_odd_seq(shared):
+    shared._words[0] += 1                   # a writer died mid-update
+    with pytest.raises(TimeoutError):
+        shared.latest()
+
+
+def test_writer_times_out_on_a_stranded_lock(shared):
+    shared.lock.acquire()                   # held by a worker that was killed
+    with pytest.raises(TimeoutError):
+        shared.compare_and_swap(1, PrimitiveVector())
+
+
+def test_recover_releases_the_lock_and_evens_seq(shared):
+    _, version = shared.latest()
+    shared.lock.acquire()
+    shared._words[0] += 1
+    assert sorted(shared.recover()) == ["lock", "seq"]
+    vector, after = shared.latest()
+    assert after == version + 1             # in-flight CAS against `version` re-merges
+    assert shared.compare_and_swap(after, vector) == after + 1
+
+
+def test_recover_is_a_no_op_on_a_healthy_store(shared):
+    assert shared.recover() == []
+    assert shared.compare_and_swap(1, PrimitiveVector()) == 2
+
+
+def test_readers_in_threads_see_every_commit(shared):
+    stop = threading.Event()
+    versions = []
+
+    def reader():
+        while not stop.is_set():
+            versions.append(shared.latest()[1])
+
+    t = threading.Thread(target=reader)
+    t.start()
+    for v in range(1, 200):
+        assert shared.compare_and_swap(v, PrimitiveVector()) == v + 1
+    stop.set()
+    t.join()
+    assert versions == sorted(versions)
+
+
+# ── open_primitives_store ────────────────────────────────────────────────────
+
+def test_shared_without_a_lock_is_a_memory_store():
+    assert isinstance(sc.open_primitives_store("shared"), sc.MemoryPrimitivesStore)
+    assert isinstance(sc.open_primitives_store(""), sc.MemoryPrimitivesStore)
+
+
+def test_shared_with_a_lock_is_shared_memory():
+    store = sc.open_primitives_store("", multiprocessing.Lock())
+    try:
+        assert isinstance(store, sc.SharedPrimitives)
+    finally:
+        store.close()
+
+
+# ── Every backend: CAS and merge-on-conflict ─────────────────────────────────
+
+@pytest.fixture(params=["memory", "sqlite", "shared", "redis"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        store = MemoryPrimitivesStore()
+    elif request.param == "sqlite":
+        store = SQLitePrimitivesStore(str(tmp_path / "primitives.sqlite3"))
+    elif request.param == "shared":
+        store = sc.SharedPrimitives.create(multiprocessing.Lock())
+    else:
+        fakeredis = pytest.importorskip("fakeredis")
+        store = sc.RedisPrimitivesStore(client=fakeredis.FakeRedis(decode_responses=True),
+                                        refresh_s=0.0)
+    yield store
+    store.close()
+
+
+def test_store_is_abstract():
+    with pytest.raises(TypeError):
+        PrimitivesStore()
+
+
+def test_cas_rejects_a_stale_version(store):
+    vector, version = store.latest()
+    assert store.compare_and_swap(version, vector.replace(brevity=0.5)) == version + 1
+    assert store.compare_and_swap(version, vector.replace(brevity=0.9)) is None
+    latest, now = store.latest()
+    assert now == version + 1 and latest["brevity"] == 0.5
+
+
+@pytest.mark.parametrize("offset", [1, 999])
+def test_cas_rejects_a_version_ahead_of_latest(store, offset):
+    vector, version = store.latest()
+    assert store.compare_and_swap(version + offset, vector.replace(brevity=0.9)) is None
+    assert store.latest() == (vector, version)
+
+
+def test_cas_rejects_a_far_behind_version(store):
+    vector, version = store.latest()
+    for i in range(3):
+        store.compare_and_swap(version + i, vector.replace(brevity=0.1 * (i + 1)))
+    assert store.compare_and_swap(version, vector.replace(brevity=0.9)) is None
+    assert store.latest()[1] == version + 3
+    assert store.latest()[0]["brevity"] == pytest.approx(0.3)
+
+
+def test_cas_rejects_a_negative_version(store):
+    vector, version = store.latest()
+    assert store.compare_and_swap(-5, vector.replace(brevity=0.9)) is None
+    assert store.latest() == (vector, version)
+
+
+@pytest.mark.parametrize("bad_version", [999, -5])
+def test_commit_from_an_unknown_version_merges_onto_latest(store, bad_version):
+    base, version = store.latest()
+    learned = base.replace(brevity=base["brevity"] + 0.05)
+    result = store.commit(base, bad_version, learned)
+    assert result["committed"] and result["version"] == version + 1
+    assert store.latest()[1] == version + 1
+    assert store.latest()[0]["brevity"] == pytest.approx(base["brevity"] + 0.05)
+
+
+def test_commit_without_conflict_installs_learned(store):
+    base, version = store.latest()
+    learned = base.replace(anti_hyperbole=base["anti_hyperbole"] + 0.05)
+    result = store.commit(base, version, learned)
+    assert result == {"committed": True, "base_version": version,
+                      "version": version + 1, "conflicts": 0}
+    assert store.latest() == (learned, version + 1)
+
+
+def test_commit_after_a_conflict_merges_both_deltas(store):
+    base, version = store.latest()
+    first  = base.replace(anti_hyperbole=base["anti_hyperbole"] + 0.05)
+    second = base.replace(source_attribution=base["source_attribution"] + 0.03,
+                          anti_hyperbole=base["anti_hyperbole"] + 0.01)
+    assert store.commit(base, version, first)["conflicts"] == 0
+    result = store.commit(base, version, second)        # same base: lost the race
+    assert result["committed"] and result["conflicts"] == 1
+    merged, now = store.latest()
+    assert now == version + 2
+    assert merged["anti_hyperbole"] == pytest.approx(base["anti_hyperbole"] + 0.06)
+    assert merged["source_attribution"] == pytest.approx(base["source_attribution"] + 0.03)
+
+
+def test_commit_with_no_base_version_merges_onto_latest(store):
+    base, version = store.latest()
+    store.compare_and_swap(version, base.replace(brevity=0.2))
+    own = PrimitiveVector()
+    result = store.commit(own, None, own.replace(brevity=own["brevity"] + 0.1))
+    assert result["committed"]
+    assert store.latest()[0]["brevity"] == pytest.approx(0.3)
+
+
+def test_commit_with_no_change_is_a_no_op(store):
+    base, version = store.latest()
+    assert store.commit(base, version, base) == {"committed": False, "base_version": version,
+                                                 "version": version, "conflicts": 0}
+
+
+def test_concurrent_commits_lose_no_updates(store):
+    steps, threads = 20, 4
+
+    def learner():
+        for _ in range(steps):
+            base, version = store.latest()
+            store.commit(base, version, base.with_deltas({"brevity": 0.001}, ceiling=10.0))
+
+    start = store.latest()[0]["brevity"]
+    workers = [threading.Thread(target=learner) for _ in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    assert store.latest()[0]["brevity"] == pytest.approx(start + steps * threads * 0.001)
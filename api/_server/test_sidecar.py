@@ -0,0 +1,780 @@
+"""Tests for wandb_sidecar's HTTP handler and episode pipeline (no network, no W&B)."""
+
+import json, socket, threading, time
+import http.client
+from http.server import HTTPServer
+
+import pytest
+
+import wandb_sidecar as sc
+from test_newsroom_core import random_texts
+
+
+@pytest.fixture
+def server():
+    httpd = HTTPServer(("127.0.0.1", 0), sc.TraceHandler)
+    t = threading.Thread(target=httpd.serve_forever, daemon=True)
+    t.start()
+    yield httpd.server_address
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def pooled():
+    httpd = sc.PooledHTTPServer(("127.0.0.1", 0), sc.TraceHandler, workers=1, queue_depth=0)
+    t = threading.Thread(target=httpd.serve_forever, daemon=True)
+    t.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.drain()
+
+
+def _get(addr, path):
+    conn = http.client.HTTPConnection(*addr, timeout=5)
+    conn.request("GET", path)
+    resp = conn.getresponse()
+    out = resp.status, json.loads(resp.read())
+    conn.close()
+    return out
+
+
+def _post(addr, path, body, headers=None):
+    conn = http.client.HTTPConnection(*addr, timeout=5)
+    data = body if isinstance(body, str) else json.dumps(body)
+    conn.request("POST", path, data, {"Content-Type": "application/json", **(headers or {})})
+    resp = conn.getresponse()
+    out = resp.status, json.loads(resp.read())
+    conn.close()
+    return out
+
+
+# ── PooledHTTPServer ─────────────────────────────────────────────────────────
+
+def test_silent_clients_do_not_hold_up_health(pooled):
+    silent = [socket.create_connection(pooled.server_address) for _ in range(2)]
+    try:
+        t0 = time.perf_counter()
+        status, body = _get(pooled.server_address, "/health")
+        assert status == 200 and body["ok"]
+        assert time.perf_counter() - t0 < 1.0      # not behind 2 s header timeouts
+    finally:
+        for s in silent:
+            s.close()
+
+
+def test_full_triage_queue_is_answered_503_at_accept():
+    class Tiny(sc.PooledHTTPServer):
+        fast_workers, triage_depth, peek_timeout_s = 1, 1, 5.0
+
+    httpd = Tiny(("127.0.0.1", 0), sc.TraceHandler, workers=1, queue_depth=0)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    silent = [socket.create_connection(httpd.server_address) for _ in range(2)]
+    try:
+        deadline = time.monotonic() + 2
+        while httpd._triaging < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        t0 = time.perf_counter()
+        status, body = _get(httpd.server_address, "/health")
+        assert status == 503 and body == {"error": "overloaded", "stage": "accept"}
+        assert time.perf_counter() - t0 < 1.0         # not behind the 5 s peeks
+        status, _ = _post(httpd.server_address, "/trace", {"topic": "t"})
+        assert status == 503
+    finally:
+        for s in silent:
+            s.close()
+        httpd.shutdown()
+        httpd.drain()
+    assert not httpd._lingering
+
+
+def test_over_capacity_is_answered_503(pooled):
+    pooled._pending = pooled._capacity              # every slot taken
+    try:
+        status, body = _post(pooled.server_address, "/trace", {"topic": "t"})
+        assert status == 503 and body["error"] == "overloaded"
+    finally:
+        pooled._pending = 0
+
+
+# ── Deadlines ────────────────────────────────────────────────────────────────
+
+@pytest.mark.parametrize("value", ["nan", "inf", "-inf", "0", "-5", "soon"])
+def test_trace_rejects_bad_deadline_header(server, value):
+    status, body = _post(server, "/trace", {"topic": "t"}, {"X-Deadline-Ms": value})
+    assert status == 400
+    assert "deadline_ms" in body["error"]
+
+
+@pytest.mark.parametrize("raw", ["NaN", "Infinity", "0", "-1"])
+def test_trace_rejects_bad_deadline_body(server, raw):
+    # json.loads accepts the NaN/Infinity literals, so they reach _trace as floats
+    status, body = _post(server, "/trace", '{"topic": "t", "deadline_ms": %s}' % raw)
+    assert status == 400
+    assert "deadline_ms" in body["error"]
+
+
+@pytest.mark.parametrize("version", [True, -1, 2, "1", 1.0])
+def test_trace_rejects_unknown_primitives_version(server, monkeypatch, version):
+    monkeypatch.setattr(sc, "PRIMITIVES_STORE", sc.MemoryPrimitivesStore())   # latest is 1
+    status, body = _post(server, "/trace", {"topic": "t", "primitives": {},
+                                            "primitives_version": version})
+    assert status == 400
+    assert "primitives_version" in body["error"] and body["latest_version"] == 1
+
+
+# ── Episode pipeline: rounds, budgets, aborted drafts ────────────────────────
+
+HYPE  = ("Host: GPT-7 is a revolutionary, incredible, game-changing breakthrough. "
+         "Sources say it is unbelievable. Stay tuned!")
+CLEAN = ("Host: Welcome back. According to Reuters on March 4, the chipmaker "
+         "reported quarterly revenue of 2.1 billion dollars, up 8 percent. "
+         "Analysts at Gartner expect supply to stay tight through the second "
+         "quarter, and the company confirmed a new fab in Arizona.")
+
+
+@pytest.fixture
+def scripted(monkeypatch):
+    """generate_text() that hands out canned texts: `draft` first, then `regens`."""
+    calls = []
+    script = {"draft": HYPE, "regens": [CLEAN], "aborted": False}
+
+    def fake_generate(topic, primitives, mode, use_cache=True, deadline=None, stream=False):
+        calls.append(mode)
+        if mode == "raw":
+            text = script["draft"]
+        else:
+            regens = script["regens"]
+            text = regens[min(len(calls) - 2, len(regens) - 1)]
+        profile = {"hf_model_used": "fake", "hf_request_ms": 5, "hf_tokens_out_est": 40,
+                   "prompt_chars": 400, "used_fallback": False, "failure_chain": [],
+                   "cache_hit": False, "aborted_at_token": None}
+        if mode == "raw" and script["aborted"]:
+            profile.update(aborted_at_token=3, abort_phrase="gpt-7")
+        return text, profile
+
+    monkeypatch.setattr(sc, "generate_text", fake_generate)
+    monkeypatch.setattr(sc, "SPECULATIVE_REGEN", False)
+    script["calls"] = calls
+    return script
+
+
+def _run(**telemetry):
+    episode = {"episode_num": 1, "episode_id": "ep_test", "boot_id": "b", "topic": "AI chips"}
+    return sc.run_episode_pipeline(episode, sc.GATE_THRESHOLD, "", telemetry)
+
+
+def _step(out, name):
+    return next(c for c in out["children"] if c["step"]["name"] == name)
+
+
+def test_failing_draft_regenerates_until_pass(scripted):
+    out = _run()
+    assert scripted["calls"] == ["raw", "optimized"]
+    assert out["final_text"] == CLEAN and out["gate_passed"]
+    assert out["summary"]["regen"]["stop_reason"] == "passed"
+
+
+def test_round_cap_zero_ships_the_draft(scripted):
+    out = _run(max_rounds=0)
+    assert scripted["calls"] == ["raw"]
+    assert out["final_text"] == HYPE
+    assert out["summary"]["regen"]["stop_reason"] == "round_cap"
+
+
+def test_short_deadline_skips_regeneration(scripted):
+    out = _run(deadline_ms=1)
+    assert scripted["calls"] == ["raw"]
+    assert out["summary"]["regen"]["rounds"][0]["skipped"] == "deadline_exceeded"
+    assert "deadline_exceeded" in out["summary"]["budget"]["reason_codes"]
+
+
+def test_token_budget_skips_regeneration(scripted, monkeypatch):
+    monkeypatch.setattr(sc, "REGEN_TOKEN_BUDGET", 150)
+    out = _run()
+    assert scripted["calls"] == ["raw"]
+    assert out["summary"]["regen"]["stop_reason"] == "token_budget"
+
+
+def test_no_improvement_stops_the_loop(scripted):
+    scripted["regens"] = [HYPE]
+    out = _run(max_rounds=3)
+    assert scripted["calls"] == ["raw", "optimized"]
+    assert out["summary"]["regen"]["stop_reason"] == "no_improvement"
+
+
+def test_aborted_draft_scores_as_fail(scripted):
+    scripted["aborted"] = True
+    out = _run()
+    outputs = _step(out, "3_evaluation")["outputs"]
+    assert outputs["score"] == 0.0 and not outputs["passed"]
+    assert outputs["quality_band"] == "fail"
+    assert out["final_text"] == CLEAN
+
+
+@pytest.mark.parametrize("telemetry,patch", [
+    ({"max_rounds": 0}, {}),
+    ({"deadline_ms": 1}, {}),
+    ({}, {"REGEN_TOKEN_BUDGET": 150}),
+])
+def test_aborted_draft_is_never_shipped(scripted, monkeypatch, telemetry, patch):
+    scripted["aborted"] = True
+    for name, value in patch.items():
+        monkeypatch.setattr(sc, name, value)
+    out = _run(**telemetry)
+    assert scripted["calls"] == ["raw"]
+    assert out["final_text"] != HYPE
+    assert out["summary"]["regen"]["shipped_fallback"]
+
+
+def test_rounds_run_until_the_round_cap(scripted, monkeypatch):
+    scripted["regens"] = [HYPE]
+    monkeypatch.setattr(sc, "REGEN_MIN_DELTA", -1.0)       # never stop for lack of progress
+    out = _run(max_rounds=2, bypass_cache=True)             # no prompt_unchanged skip
+    assert scripted["calls"] == ["raw", "optimized", "optimized"]
+    assert out["summary"]["regen"]["stop_reason"] == "round_cap"
+    assert [r["round"] for r in out["summary"]["regen"]["rounds"]] == [1, 2]
+
+
+def test_unchanged_prompt_skips_the_round(scripted, monkeypatch):
+    scripted["regens"] = [HYPE]
+    monkeypatch.setattr(sc, "REGEN_MIN_DELTA", -1.0)
+    monkeypatch.setattr(sc, "learn", lambda primitives, issues: (primitives, []))
+    out = _run(max_rounds=3)
+    assert scripted["calls"] == ["raw", "optimized"]
+    assert out["summary"]["regen"]["rounds"][1]["skipped"] == "prompt_unchanged"
+
+
+@pytest.fixture
+def speculating(scripted, monkeypatch):
+    """scripted + speculation on a fresh pool; the draft waits until the speculative call runs."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    started, fake = threading.Event(), sc.generate_text
+
+    def generate(topic, primitives, mode, *args, **kwargs):
+        if mode == "raw":
+            started.wait(5)
+        else:
+            started.set()
+        return fake(topic, primitives, mode, *args, **kwargs)
+
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(sc, "generate_text", generate)
+    monkeypatch.setattr(sc, "_spec_pool", pool)
+    monkeypatch.setattr(sc, "SPECULATION", sc.SpeculationStats())
+    scripted["started"], scripted["pool"] = started, pool
+    yield scripted
+    pool.shutdown(wait=True)
+
+
+def _predict_the_draft(monkeypatch):
+    monkeypatch.setattr(sc, "_predict_issues", lambda topic, p: sc.evaluate(HYPE, p)["issues"])
+
+
+def test_speculation_hit_is_the_first_round(speculating, monkeypatch):
+    _predict_the_draft(monkeypatch)
+    out = _run(speculative=True)
+    assert sorted(speculating["calls"]) == ["optimized", "raw"]      # no second regen call
+    assert out["summary"]["speculation"] == "used" and out["final_text"] == CLEAN
+    assert sc.SPECULATION.used == 1 and sc.SPECULATION.wasted_ratio == 0.0
+
+
+def test_mispredicted_speculation_is_wasted(speculating, monkeypatch):
+    monkeypatch.setattr(sc, "_predict_issues", lambda topic, p: [])   # predicts no learning
+    out = _run(speculative=True)
+    assert speculating["calls"].count("optimized") == 2              # spec + the real regen
+    assert out["summary"]["speculation"] == "wasted" and out["final_text"] == CLEAN
+    assert sc.SPECULATION.wasted == 1 and sc.SPECULATION.wasted_ratio == 1.0
+
+
+def test_speculation_still_queued_is_cancelled_and_not_counted_as_a_call(speculating,
+                                                                          monkeypatch):
+    gate = threading.Event()
+    speculating["pool"].submit(gate.wait, 5)                         # hold the only worker
+    speculating["started"].set()
+    out = _run(speculative=True, max_rounds=0)
+    gate.set()
+    assert out["summary"]["speculation"] == "cancelled" and speculating["calls"] == ["raw"]
+
+    _predict_the_draft(monkeypatch)
+    speculating["started"].clear()
+    _run(speculative=True)                                          # used
+    monkeypatch.setattr(sc, "_predict_issues", lambda topic, p: [])
+    speculating["started"].clear()
+    _run(speculative=True)                                          # wasted
+    stats = sc.SPECULATION
+    assert (stats.launched, stats.used, stats.wasted, stats.cancelled) == (3, 1, 1, 1)
+    assert stats.wasted_ratio == 0.5                                # 1 wasted of 2 calls made
+
+
+@pytest.mark.parametrize("value", [-1, "2", 1.5])
+def test_trace_rejects_bad_max_rounds(server, value):
+    status, body = _post(server, "/trace", {"topic": "t", "max_rounds": value})
+    assert status == 400
+    assert "max_rounds" in body["error"]
+
+
+def test_evaluation_step_profile_reports_memo_lookups(scripted):
+    scripted["draft"] = HYPE + " Unique to this test."
+    first  = _step(_run(max_rounds=0), "3_evaluation")["profile"]["eval_memo"]
+    second = _step(_run(max_rounds=0), "3_evaluation")["profile"]["eval_memo"]
+    assert first == {"hits": 0, "misses": 1}
+    assert second == {"hits": 1, "misses": 0}
+
+
+# ── evaluate() against the per-phrase rubric ─────────────────────────────────
+
+def _evaluate_per_phrase(text, primitives):
+    """evaluate() as it read before the matcher: one `in` scan per phrase."""
+    issues, by_type, score, lower = [], {}, 100.0, text.lower()
+    for phrase in sc.BANNED_PRODUCTS:
+        if phrase in lower:
+            issues.append({"type": "hallucination",
+                           "message": f"Detected unreleased product: {phrase}"})
+            by_type["hallucination"] = by_type.get("hallucination", 0) + 1
+            score -= 30 * primitives.get("fact_verification", 0.65)
+    hyp_count = sum(1 for w in sc.HYPERBOLE_WORDS if w in lower)
+    if hyp_count >= 3:
+        issues.append({"type": "hyperbole",
+                       "message": f"Excessive superlatives ({hyp_count} instances)"})
+        by_type["hyperbole"] = 1
+        score -= 20 * primitives.get("anti_hyperbole", 0.75)
+    if not any(s in lower for s in sc.SOURCE_MARKERS) and len(text.split()) > 20:
+        issues.append({"type": "missing_source",
+                       "message": "Claims lack specific attribution or dates"})
+        by_type["missing_source"] = 1
+        score -= 15 * primitives.get("source_attribution", 0.72)
+    if any(v in lower for v in sc.VAGUE_TEMPORAL):
+        issues.append({"type": "temporal_vague", "message": "Vague temporal references detected"})
+        by_type["temporal_vague"] = 1
+        score -= 10 * primitives.get("temporal_accuracy", 0.70)
+    if len(text.split()) < 25 or ("bullet 1" in lower and "bullet 2" in lower):
+        issues.append({"type": "low_specificity", "message": "Content lacks specific detail"})
+        by_type["low_specificity"] = 1
+        score -= 8 * primitives.get("fact_verification", 0.65)
+    score = max(0.0, min(100.0, score))
+    passed = (score / 100.0) >= sc.GATE_THRESHOLD
+    return {"score": round(score / 100.0, 4), "passed": passed, "issues": issues,
+            "issues_count": len(issues), "issues_by_type": by_type,
+            "quality_band": "pass" if passed else ("warn" if score >= 50 else "fail")}
+
+
+def test_evaluate_matches_the_per_phrase_rubric():
+    primitives = [sc.DEFAULT_PRIMITIVES, sc.PrimitiveVector().replace(fact_verification=0.95)]
+    for i, text in enumerate(random_texts(sc.MATCHER.phrases, 2000, seed=3)):
+        text = text.upper() if i % 5 == 0 else text
+        p = primitives[i % 2]
+        assert sc.evaluate(text, p) == _evaluate_per_phrase(text, p), text
+
+
+def _assert_rows_match(texts, primitives):
+    batch = sc.evaluate_many(texts, primitives)
+    assert len(batch["score"]) == len(texts)
+    for i, text in enumerate(texts):
+        one = sc.evaluate(text, primitives)
+        assert batch["score"][i] == pytest.approx(one["score"]), text
+        assert bool(batch["passed"][i]) == one["passed"]
+        assert batch["issues_count"][i] == one["issues_count"]
+        assert batch["quality_band"][i] == one["quality_band"]
+        by_type = {t: int(n) for t, n in zip(batch["rule_types"], batch["issues_by_type"][i]) if n}
+        assert by_type == one["issues_by_type"]
+
+
+def test_evaluate_many_matches_evaluate_row_by_row():
+    texts = [HYPE, CLEAN, "", "Bullet 1 bullet 2"] + random_texts(sc.MATCHER.phrases, 500, seed=5)
+    _assert_rows_match(texts, sc.DEFAULT_PRIMITIVES)
+    _assert_rows_match(texts, sc.PrimitiveVector().replace(anti_hyperbole=0.95, brevity=0.1))
+
+
+def test_evaluate_many_of_nothing_is_empty():
+    batch = sc.evaluate_many([], sc.DEFAULT_PRIMITIVES)
+    assert batch["rule_types"] == sc.RULE_TYPES
+    for key in ("score", "passed", "issues_count", "quality_band"):
+        assert len(batch[key]) == 0
+    assert batch["issues_by_type"].shape == (0, len(sc.RULE_TYPES))
+
+
+# ── Learning ─────────────────────────────────────────────────────────────────
+
+def test_learn_copies_on_write():
+    p = sc.PrimitiveVector()
+    same, mutations = sc.learn(p, [{"type": "bullet_points", "message": "no rule"}])
+    assert same is p and mutations == []
+
+    issues = [{"type": "hyperbole", "message": "m"}, {"type": "hyperbole", "message": "m"},
+              {"type": "hallucination", "message": "m"}]
+    learned, mutations = sc.learn(p, issues)
+    assert learned is not p and p == sc.DEFAULT_PRIMITIVES          # input never mutated
+    assert learned["anti_hyperbole"] == pytest.approx(0.95)
+    assert learned["fact_verification"] == pytest.approx(0.80)
+    assert [m["primitive_name"] for m in mutations] == ["anti_hyperbole", "anti_hyperbole",
+                                                        "fact_verification"]
+    capped, _ = sc.learn(learned, issues)
+    assert capped["anti_hyperbole"] == 1.0
+
+    as_dict = dict(sc.DEFAULT_PRIMITIVES)
+    from_dict, _ = sc.learn(as_dict, issues)
+    assert from_dict == learned and as_dict == sc.DEFAULT_PRIMITIVES
+
+
+# ── Generation profiles ──────────────────────────────────────────────────────
+
+def test_generation_profile_has_the_same_keys_on_every_path(monkeypatch):
+    import httpx
+
+    def fake_post(url, headers, payload, timeout=None, stats=None):
+        if "fail" in payload["inputs"]:
+            raise httpx.LocalProtocolError("bad request")
+        return httpx.Response(200, json=[{"generated_text": "Host: measured, sourced copy."}],
+                              request=httpx.Request("POST", url))
+
+    monkeypatch.setattr(sc, "_http_post", fake_post)
+    monkeypatch.setattr(sc, "GEN_CACHE", sc.GenerationCache(8, 60))
+    monkeypatch.setattr(sc, "GEN_CACHE_BYPASS", False)
+    prims = sc.PrimitiveVector().to_dict()
+
+    _, upstream = sc.generate_text("profile shape", prims, "raw")
+    _, cached   = sc.generate_text("profile shape", prims, "raw")
+    _, fallback = sc.generate_text("fail", prims, "raw")
+    assert cached["cache_hit"] and not upstream["cache_hit"] and fallback["used_fallback"]
+    assert set(cached) == set(upstream) == set(fallback)
+    assert cached["coalesced"] is False and cached["hf_attempts"] == 0
+    assert upstream["hf_attempts"] == 1 and fallback["hf_attempts"] == 1
+
+
+def test_streaming_and_plain_callers_never_share_a_flight(monkeypatch):
+    """A plain caller must not get a streaming leader's aborted partial draft."""
+    entered, release, calls = threading.Event(), threading.Event(), []
+
+    def fake_call_hf(topic, mode, prompt, prompt_hash, payload, t0, deadline, stream=False):
+        calls.append(stream)
+        if stream:
+            entered.set()
+            release.wait(5)
+            return "Partial dra", {"used_fallback": False, "aborted_at_token": 3,
+                                   "hf_request_id": "s", "failure_chain": []}
+        return "Full draft.", {"used_fallback": False, "aborted_at_token": None,
+                               "hf_request_id": "p", "failure_chain": []}
+
+    monkeypatch.setattr(sc, "_call_hf", fake_call_hf)
+    monkeypatch.setattr(sc, "GEN_CACHE", sc.GenerationCache(8, 60))
+    monkeypatch.setattr(sc, "GEN_CACHE_BYPASS", False)
+    prims = sc.PrimitiveVector().to_dict()
+
+    streamed = {}
+    leader = threading.Thread(target=lambda: streamed.update(
+        out=sc.generate_text("same prompt", prims, "raw", stream=True)))
+    leader.start()
+    assert entered.wait(5)
+    text, profile = sc.generate_text("same prompt", prims, "raw")
+    release.set()
+    leader.join(5)
+
+    assert text == "Full draft." and profile["aborted_at_token"] is None
+    assert "coalesced" not in profile and sorted(calls) == [False, True]
+    assert streamed["out"][1]["aborted_at_token"] == 3
+
+
+def test_error_event_in_a_200_stream_is_an_upstream_failure(monkeypatch):
+    import httpx
+
+    bodies = iter([
+        'data: {"token": {"text": "Host:", "special": false}}\n\n'
+        'data: {"error": "Request failed during generation: CUDA OOM"}\n\n',
+        'data: {"token": {"text": "Host: sourced copy.", "special": false}}\n\n',
+    ])
+    transport = httpx.MockTransport(lambda request: httpx.Response(
+        200, text=next(bodies), headers={"content-type": "text/event-stream"}))
+    monkeypatch.setattr(sc, "_http_client", httpx.Client(transport=transport))
+    monkeypatch.setattr(sc, "_host_limiters", {})
+    monkeypatch.setattr(sc, "HF_BREAKER", sc.CircuitBreaker("test", 60, 3, 1.0, 60))
+    monkeypatch.setattr(sc, "HF_RETRY", sc.RetryPolicy(0.0, 0.0))
+    monkeypatch.setattr(sc, "HF_RETRY_ATTEMPTS", 2)
+
+    text, profile = sc._call_hf("topic", "raw", "prompt", "h", {"inputs": "prompt"},
+                                time.perf_counter(), time.monotonic() + 5, stream=True)
+
+    assert text == "Host: sourced copy." and not profile["used_fallback"]
+    assert profile["hf_attempts"] == 2
+    assert profile["failure_chain"][0]["error_message"].startswith("stream error: Request failed")
+    breaker = sc.HF_BREAKER.snapshot()
+    assert breaker["window_calls"] == 2 and breaker["failure_rate"] == 0.5
+    assert sc._host_limiter(sc.HF_API_BASE + "/m").drops == 1
+
+
+# ── Episode memory (MemoryStore) ─────────────────────────────────────────────
+
+@pytest.fixture
+def fake_redis():
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    return server, lambda: fakeredis.FakeRedis(server=server, decode_responses=True)
+
+
+def test_memory_probe_near_cache_hit_sends_only_the_set(fake_redis):
+    server, client = fake_redis
+    store = sc.MemoryStore(client=client(), ttl_s=600)
+    first  = store.probe("k", {"n": 1})
+    second = store.probe("k", {"n": 2})
+    assert first["connected"] and not first["hit"]
+    assert second["near_hit"] and second["value"] == {"n": 1}
+    raw = client()
+    assert json.loads(raw.get("k")) == {"n": 2}
+    assert 0 < raw.ttl("k") <= 600
+
+
+def test_memory_probe_reads_redis_after_near_cache_expiry(fake_redis):
+    server, client = fake_redis
+    store = sc.MemoryStore(client=client(), near_ttl_s=0.05)
+    store.probe("k", {"n": 1})
+    time.sleep(0.1)
+    out = store.probe("k", {"n": 2})
+    assert out["hit"] and not out["near_hit"]
+    assert out["value"] == {"n": 1}
+    # a second process (cold near-cache) sees the same value
+    other = sc.MemoryStore(client=client()).probe("k", {"n": 3})
+    assert other["hit"] and not other["near_hit"] and other["value"] == {"n": 2}
+
+
+def test_memory_probe_falls_back_to_near_cache_when_redis_is_down(fake_redis):
+    server, client = fake_redis
+    server.connected = False
+    store = sc.MemoryStore(client=client(), retry_s=60)
+    first  = store.probe("k", {"n": 1})
+    second = store.probe("k", {"n": 2})            # inside the retry window
+    assert not first["connected"] and first["error"]
+    assert not second["connected"] and second["error"] == first["error"]
+    assert second["near_hit"] and second["value"] == {"n": 1}
+
+
+def test_memory_store_connects_once_under_concurrent_probes(fake_redis):
+    server, client = fake_redis
+    pings = []
+
+    class SlowPing(type(client())):
+        def ping(self, *a, **k):
+            pings.append(1)
+            time.sleep(0.05)
+            return super().ping(*a, **k)
+
+    store = sc.MemoryStore(client=SlowPing(server=server, decode_responses=True))
+    results = []
+    threads = [threading.Thread(target=lambda i=i: results.append(store.probe(f"k{i}", {"i": i})))
+               for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(pings) == 1
+    assert all(r["connected"] and r["error"] is None for r in results)
+
+
+
+# ── TraceExporter ────────────────────────────────────────────────────────────
+
+def _wait_for(cond, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_trace_exporter_batches_in_order(tmp_path):
+    gate, batches, flushes = threading.Event(), [], []
+
+    def emit_batch(items):
+        gate.wait(5)
+        batches.append([i["n"] for i in items])
+
+    exporter = sc.TraceExporter(emit_batch=emit_batch, flush=lambda: flushes.append(1),
+                                batch=4, flush_s=0.05, spill_path=str(tmp_path / "spill.jsonl"))
+    for n in range(9):
+        exporter.submit({"n": n})
+    gate.set()
+    _wait_for(lambda: exporter.exported == 9)
+    exporter.close()
+
+    assert [n for b in batches for n in b] == list(range(9))
+    assert max(map(len, batches)) == 4 and len(batches) <= 4     # first batch may leave early
+    assert len(flushes) == len(batches) and exporter.spilled == 0
+
+
+def test_trace_exporter_spills_when_full_and_feeds_the_spill_back(tmp_path):
+    gate, seen = threading.Event(), []
+    spill = tmp_path / "spill.jsonl"
+
+    def emit(item):
+        gate.wait(5)
+        seen.append(item["n"])
+
+    exporter = sc.TraceExporter(emit=emit, max_queue=2, batch=2, flush_s=0.05,
+                                spill_path=str(spill))
+    for n in range(10):
+        exporter.submit({"n": n})
+    assert exporter.spilled > 0 and spill.exists()
+    gate.set()
+    _wait_for(lambda: exporter.exported == 10)
+    exporter.close()
+
+    assert sorted(seen) == list(range(10)) and not spill.exists()
+
+
+def test_trace_exporter_retries_then_spills_what_keeps_failing(tmp_path, monkeypatch):
+    monkeypatch.setattr(sc.random, "uniform", lambda a, b: 0.0)
+    spill = tmp_path / "spill.jsonl"
+    calls = {"flaky": 0}
+
+    def emit(item):
+        if item["n"] == "flaky":
+            calls["flaky"] += 1
+            if calls["flaky"] == 1:
+                raise ConnectionError("W&B down")
+        elif item["n"] == "broken":
+            raise ConnectionError("W&B down")
+
+    exporter = sc.TraceExporter(emit=emit, flush_s=0.05, spill_path=str(spill))
+    exporter._export([{"n": "flaky"}, {"n": "ok"}])
+    assert calls["flaky"] == 2 and exporter.retries == 1 and exporter.exported == 2
+
+    exporter.max_attempts = 1
+    exporter._export([{"n": "broken"}])
+    assert exporter.spilled == 1
+    assert [json.loads(l) for l in spill.read_text().splitlines()] == [{"n": "broken"}]
+
+
+# ── Offline replay ───────────────────────────────────────────────────────────
+
+def test_load_episode_records_reads_logs_spills_and_weave_exports(tmp_path):
+    path = tmp_path / "episodes.jsonl"
+    path.write_text("\n".join([
+        json.dumps({"topic": "a", "draft_text": "draft a", "final_text": "final a"}),
+        "not json",
+        json.dumps({"output": {"topic": "b", "draft_text": "draft b", "final_text": ""}}),
+        json.dumps({"event": "telemetry", "payload": {}}),              # /log/* line
+        json.dumps({"output": {"topic": "c", "draft_text": ""}}),
+        json.dumps(["not", "a", "record"]),
+        "",
+    ]))
+    assert sc.load_episode_records(str(path)) == [
+        {"topic": "a", "draft_text": "draft a", "final_text": "final a"},
+        {"topic": "b", "draft_text": "draft b", "final_text": "draft b"},  # shipped the draft
+    ]
+
+
+def test_baseline_replay_reproduces_the_recorded_scores(scripted, tmp_path):
+    drafts = [HYPE, CLEAN, HYPE + " It happened recently.", "Host: amazing news, soon.",
+              HYPE, CLEAN + " Incredible.", "Host: GPT-6 lately.", HYPE]
+    primitives, recorded, lines = sc.DEFAULT_PRIMITIVES, [], []
+    for draft in drafts:
+        scripted["draft"] = draft
+        out = _run(max_rounds=1, primitives_snapshot=primitives)
+        primitives = out["state"]["primitives_snapshot"]
+        recorded.append((_step(out, "3_evaluation")["outputs"]["score"], out["quality_score"]))
+        lines.append(json.dumps({"output": {k: out[k] for k in ("topic", "draft_text",
+                                                                "final_text")}}))
+    path = tmp_path / "weave_export.jsonl"
+    path.write_text("\n".join(lines))
+
+    records = sc.load_episode_records(str(path))
+    [baseline] = sc.replay_grid(records, sc.grid_configs([1.0], [sc.GATE_THRESHOLD]))
+    assert baseline["curve"]["draft_score"] == pytest.approx([d for d, _ in recorded], abs=1e-4)
+    assert baseline["curve"]["final_score"] == pytest.approx([f for _, f in recorded], abs=1e-4)
+    assert baseline["final_primitives"] == pytest.approx(primitives)
+    assert 0 < baseline["draft_pass_rate"] < baseline["pass_rate"]
+
+
+# ── Metrics ──────────────────────────────────────────────────────────────────
+
+def _registry():
+    reg = sc.MetricsRegistry(buckets=(10, 100))
+    reg.define("t_total", "counter", "A counter.")
+    reg.define("t_ms", "histogram", "A histogram.")
+    reg.define("t_depth", "gauge", "A gauge.")
+    return reg
+
+
+def _samples(text: str) -> dict:
+    return {line.rsplit(" ", 1)[0]: float(line.rsplit(" ", 1)[1])
+            for line in text.splitlines() if line and not line.startswith("#")}
+
+
+def test_metrics_exposition_format():
+    reg = _registry()
+    reg.inc("t_total", route="a")
+    reg.inc("t_total", 0.5, route='say "hi"\n')
+    reg.observe("t_ms", 10)                                 # le is inclusive
+    reg.observe("t_ms", 42.5)
+    reg.observe("t_ms", 1000)
+    reg.set_gauge("t_depth", 3)
+    assert reg.render() == "\n".join([
+        "# HELP t_total A counter.",
+        "# TYPE t_total counter",
+        't_total{route="a"} 1',
+        't_total{route="say \\"hi\\"\\n"} 0.5',
+        "# HELP t_ms A histogram.",
+        "# TYPE t_ms histogram",
+        't_ms_bucket{le="10"} 1',
+        't_ms_bucket{le="100"} 2',
+        't_ms_bucket{le="+Inf"} 3',
+        "t_ms_sum 1052.5",
+        "t_ms_count 3",
+        "# HELP t_depth A gauge.",
+        "# TYPE t_depth gauge",
+        "t_depth 3",
+    ]) + "\n"
+    assert _registry().render().count("# TYPE") == 3        # defined but unused: headers only
+
+
+def test_metrics_merge_every_thread_shard():
+    reg = _registry()
+
+    def work(i):
+        for _ in range(1000):
+            reg.inc("t_total", route="a")
+            reg.observe("t_ms", 50, stage="s")
+        reg.inc("t_total", route=f"only-{i}")
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    out = _samples(reg.render())
+    assert out['t_total{route="a"}'] == 8000 and len(reg._shards) == 8
+    assert all(out[f't_total{{route="only-{i}"}}'] == 1 for i in range(8))
+    assert out['t_ms_bucket{stage="s",le="10"}'] == 0
+    assert out['t_ms_bucket{stage="s",le="100"}'] == 8000
+    assert out['t_ms_sum{stage="s"}'] == 400000 and out['t_ms_count{stage="s"}'] == 8000
+
+
+def test_shared_metrics_sum_every_worker_and_label_live_gauges(tmp_path):
+    import os, subprocess
+
+    exited = subprocess.Popen(["true"])
+    exited.wait()
+    dead_pid = exited.pid
+    for worker, pid in (("1", os.getppid()), ("2", dead_pid)):
+        (tmp_path / f"metrics-{worker}-{pid}.json").write_text(json.dumps({
+            "pid": pid, "worker": worker,
+            "series": [["t_total", [["route", "a"]], 5.0], ["t_ms", [], [1, 1, 0, 60.0]]],
+            "gauges": [["t_depth", [], 7]],
+        }))
+    reg = _registry()
+    reg.share(str(tmp_path), "0", flush_s=3600)
+    reg.inc("t_total", 2, route="a")
+    reg.observe("t_ms", 500)
+    reg.set_gauge("t_depth", 3)
+
+    out = _samples(reg.render())
+    assert out['t_total{route="a"}'] == 12                  # 2 + 5 + 5 (exited worker too)
+    assert out['t_ms_bucket{le="10"}'] == 2
+    assert out['t_ms_bucket{le="+Inf"}'] == 5 and out["t_ms_count"] == 5
+    assert out["t_ms_sum"] == 620
+    assert out['t_depth{worker="0"}'] == 3 and out['t_depth{worker="1"}'] == 7
+    assert 't_depth{worker="2"}' not in out                  # gauges only from live workers
+
+    reg.flush()
+    mine = json.loads((tmp_path / f"metrics-0-{os.getpid()}.json").read_text())
+    assert mine["worker"] == "0" and ["t_total", [["route", "a"]], 2.0] in mine["series"]
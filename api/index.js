@@ -2341,11 +2341,16 @@ app.post("/api/run-cycle", async (req, res) => {
       primitives,
       episode_num: episodeNum
     });
+    const traceBudgetMs = Number(process.env.SIDECAR_TRACE_BUDGET_MS ?? 45e3);
     let weaveResult = null;
     try {
       const sidecarRes = await fetch("http://localhost:5199/trace", {
         method: "POST",
-        headers: { "Content-Type": "application/json" },
+        headers: {
+          "Content-Type": "application/json",
+          "X-Deadline-Ms": String(traceBudgetMs)
+        },
+        signal: AbortSignal.timeout(traceBudgetMs + 2e3),
         body: JSON.stringify({
           episode_num: episodeNum,
           episode_id: out.episode_id ?? `ep_${episodeNum}`,
@@ -14,16 +14,28 @@ Install
     git clone https://github.com/ShaliniAnandaPhD/Neuron.git
     cd Neuron && pip install -e .
     cd ..
-    pip install requests python-dotenv
+    pip install "httpx[http2]" python-dotenv
 
 Run
 ---
     python newsroom_circuit.py
 """
 
-import os, time, json, hashlib, uuid
+import os, sys, time, json, hashlib, uuid, asyncio
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
+# ── Shared with the W&B sidecar (api/_server/newsroom_core.py) ───────────
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, "api", "_server"))
+from newsroom_core import (
+    DEFAULT_PRIMITIVES, LEARN_RULES, PrimitiveVector, BANNED_PRODUCTS, HYPERBOLE_WORDS,
+    SOURCE_MARKERS, VAGUE_TEMPORAL, StreamingEvaluator, StreamError, RULE_TYPES, EvalMemo,
+    RetryPolicy, CircuitBreaker, AsyncAdaptiveLimiter, AsyncSingleFlight, GenerationCache,
+    MemoryPrimitivesStore, SQLitePrimitivesStore,
+)
+from newsroom_core import evaluate_many as _evaluate_many
+
 # ── Neuron imports (from the cloned repo) ────────────────────────────────
 from neuron import initialize, create_agent, CircuitDefinition, Message
 from neuron.agents import ReflexAgent, DeliberativeAgent, LearningAgent, CoordinatorAgent
@@ -37,17 +49,36 @@ load_dotenv()
 
 HF_API_KEY   = os.getenv("HF_API_KEY", "")
 HF_MODEL     = os.getenv("HF_MODEL", "meta-llama/Llama-3.2-3B-Instruct")
+HF_API_BASE  = os.getenv("HF_API_BASE", "https://api-inference.huggingface.co/models")
+HF_MAX_PER_HOST = int(os.getenv("HF_MAX_PER_HOST", "8"))   # ceiling for the adaptive per-host limit
+HF_LIMIT_INITIAL = float(os.getenv("HF_LIMIT_INITIAL", "2"))  # starting concurrency per host
+HF_LIMIT_TOLERANCE = float(os.getenv("HF_LIMIT_TOLERANCE", "2.0"))  # latency vs no-load baseline still "flat"
+HF_TIMEOUT_S    = float(os.getenv("HF_TIMEOUT_S", "30"))
+HF_RETRY_ATTEMPTS = int(os.getenv("HF_RETRY_ATTEMPTS", "4"))  # tries per generation, first included
+HF_RETRY_BASE_S = float(os.getenv("HF_RETRY_BASE_S", "0.5"))   # backoff: base·2^n with full jitter
+HF_RETRY_MAX_S  = float(os.getenv("HF_RETRY_MAX_S", "8"))
+EPISODE_DEADLINE_S = float(os.getenv("EPISODE_DEADLINE_S", "90"))  # wall budget for one episode's HF calls
+REGEN_MIN_BUDGET_MS = float(os.getenv("REGEN_MIN_BUDGET_MS", "3000"))  # skip regeneration with less left
+REGEN_MAX_ROUNDS = int(os.getenv("REGEN_MAX_ROUNDS", "3"))       # learn → regenerate rounds per episode
+REGEN_MIN_DELTA = float(os.getenv("REGEN_MIN_DELTA", "0.02"))  # stop once a round gains less than this
+REGEN_TOKEN_BUDGET = int(os.getenv("REGEN_TOKEN_BUDGET", "1500"))  # upstream tokens per episode; 0 → no cap
+BREAKER_WINDOW_S = float(os.getenv("BREAKER_WINDOW_S", "30"))  # rolling failure-rate window
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "5"))   # calls in window before it may trip
+BREAKER_FAILURE_RATE = float(os.getenv("BREAKER_FAILURE_RATE", "0.5"))
+BREAKER_COOLDOWN_S = float(os.getenv("BREAKER_COOLDOWN_S", "15"))  # open → half-open
+REDIS_URL       = os.getenv("REDIS_URL", "")                   # "" → in-process memory only
+MEMORY_TTL_S    = int(os.getenv("MEMORY_TTL_S", str(7 * 24 * 3600)))
+NEAR_CACHE_SIZE = int(os.getenv("NEAR_CACHE_SIZE", "1024"))
+NEAR_CACHE_TTL_S = float(os.getenv("NEAR_CACHE_TTL_S", "60"))
+GEN_CACHE_SIZE  = int(os.getenv("GEN_CACHE_SIZE", "512"))
+GEN_CACHE_TTL_S = float(os.getenv("GEN_CACHE_TTL_S", "3600"))
+GEN_CACHE_PATH  = os.getenv("GEN_CACHE_PATH", "")               # SQLite file; "" → in-process only
+GEN_CACHE_BYPASS = os.getenv("GEN_CACHE_BYPASS", "0") == "1"    # sampling runs: always call HF
+HF_STREAM       = os.getenv("HF_STREAM", "0") == "1"            # stream drafts, abort on a banned product
+EVAL_MEMO_SIZE  = int(os.getenv("EVAL_MEMO_SIZE", "4096"))
+PRIMITIVES_DB   = os.getenv("PRIMITIVES_DB", "")                # SQLite file shared by runs; "" → in-process
 GATE_THRESHOLD = 0.72
 
-# 6 behavioral primitives — the only thing that changes at runtime
-DEFAULT_PRIMITIVES = {
-    "fact_verification":   0.65,
-    "anti_hyperbole":      0.75,
-    "source_attribution":  0.72,
-    "temporal_accuracy":   0.70,
-    "entertainment_value": 0.80,
-    "brevity":             0.40,
-}
 
 # ═══════════════════════════════════════════════════════════════════════════
 # 1.  CUSTOM NEURON AGENTS  (plug-and-play microservices)
@@ -56,44 +87,41 @@ DEFAULT_PRIMITIVES = {
 
 class MemoryProbeAgent(BaseAgent):
     """
-    STEP 0 — Redis-style memory probe.
-    Checks whether we have seen this topic before.  In production this
-    hits Redis; here we use an in-process dict so the demo is self-contained.
+    STEP 0 — Redis memory probe.
+    Checks whether we have seen this topic before and records this episode
+    so the next run sees it.  Backed by MEMORY_STORE: Redis when REDIS_URL
+    is set, the in-process near-cache otherwise.  All timings are measured.
     """
 
-    _store: dict = {}   # shared across instances for this session
-
-    def __init__(self):
+    def __init__(self, store: "MemoryStore | None" = None):
         super().__init__(name="memory_probe")
+        self.store = store or MEMORY_STORE
 
     async def process(self, input_data: dict) -> dict:
         topic       = input_data.get("topic", "")
         episode_id  = input_data.get("episode_id", "")
         key         = hashlib.sha256(topic.encode()).hexdigest()[:16]
-        t0          = time.perf_counter()
+        redis_key   = f"living_newsroom:memory:{key}:v1"
 
-        hit   = key in self._store
-        value = self._store.get(key)
-
-        elapsed_ms = round((time.perf_counter() - t0) * 1000, 2)
-
-        # Write current episode so next run sees it
-        self._store[key] = {
+        probe = await self.store.probe(redis_key, {
             "episode_id": episode_id,
             "topic_hash": key,
             "written_at": time.time(),
-        }
+        })
 
         return {
-            "redis_enabled":    True,
-            "redis_connected":  True,
-            "redis_connect_ms": 0.8,          # simulated latency
-            "redis_get_ms":     elapsed_ms,
-            "redis_get_hit":    hit,
-            "redis_key":        f"living_newsroom:memory:{key}:v1",
+            "redis_enabled":    self.store.enabled,
+            "redis_connected":  probe["connected"],
+            "redis_connect_ms": probe["connect_ms"],
+            "redis_get_ms":     probe["get_ms"],
+            "redis_set_ms":     probe["set_ms"],
+            "redis_roundtrip_ms": probe["roundtrip_ms"],
+            "redis_get_hit":    probe["hit"],
+            "near_cache_hit":   probe["near_hit"],
+            "redis_key":        redis_key,
             "redis_key_hash":   key,
-            "cached_payload":   value,
-            "redis_error":      None,
+            "cached_payload":   probe["value"],
+            "redis_error":      probe["error"],
         }
 
 
@@ -101,21 +129,26 @@ class GenerationAgent(BaseAgent):
     """
     STEP 1 — Calls HuggingFace (Llama-3.2-3B-Instruct) to produce a
     podcast script.  Accepts a 'mode' flag: 'raw' or 'optimized'.
+    Repeat prompts are served from GEN_CACHE unless 'bypass_cache' is set,
+    and concurrent identical prompts share one call via GEN_FLIGHT
+    ('coalesced').  Transient HF failures are retried with backoff until
+    HF_RETRY_ATTEMPTS or the 'deadline' (time.monotonic()) runs out; each
+    failed attempt is recorded in 'failure_chain'.  With 'stream', tokens
+    go through a StreamingEvaluator and the call stops at the first
+    unreleased product name ('aborted_at_token'; never cached).
     """
 
     def __init__(self):
         super().__init__(name="generation")
 
     async def process(self, input_data: dict) -> dict:
-        import requests
-
         topic      = input_data["topic"]
         primitives = input_data.get("primitives", DEFAULT_PRIMITIVES)
         mode       = input_data.get("mode", "raw")
+        stream     = input_data.get("stream", False)
 
         prompt = _build_prompt(topic, primitives, mode)
 
-        headers = {"Authorization": f"Bearer {HF_API_KEY}"}
         payload = {
             "inputs": prompt,
             "parameters": {
@@ -125,34 +158,120 @@ class GenerationAgent(BaseAgent):
             },
         }
 
-        url = f"https://api-inference.huggingface.co/models/{HF_MODEL}"
+        use_cache = not (input_data.get("bypass_cache") or GEN_CACHE_BYPASS)
+        cache_key = GenerationCache.key(HF_MODEL, hashlib.sha256(prompt.encode()).hexdigest()[:12],
+                                        payload["parameters"]["temperature"],
+                                        payload["parameters"]["max_new_tokens"])
+        cached = GEN_CACHE.get(cache_key) if use_cache else None
+        if cached is not None:
+            return _generation_result(cached["text"], HF_MODEL, mode, cache_hit=True)
 
-        try:
-            resp = requests.post(url, headers=headers, json=payload, timeout=30)
-            resp.raise_for_status()
-            data = resp.json()
+        deadline = input_data.get("deadline") or (time.monotonic() + EPISODE_DEADLINE_S)
+        if not use_cache:
+            # Sampling runs want independent draws — never share them
+            return await self._call_hf(topic, mode, prompt, payload, deadline, stream)
 
-            # HF returns a list of dicts with "generated_text"
-            if isinstance(data, list) and data:
-                raw_text = data[0].get("generated_text", "")
-            else:
-                raw_text = str(data)
+        try:
+            # A streaming leader may hand back an aborted partial draft; only
+            # callers that asked for the same check may share it.
+            result, shared = await GEN_FLIGHT.do(
+                f"{cache_key}:stream" if stream else cache_key, lambda: self._call_hf(topic, mode, prompt, payload, deadline, stream),
+                timeout=max(0.0, deadline - time.monotonic()))
+        except TimeoutError:
+            return _generation_result(_emergency_fallback(topic, mode), "fallback", mode,
+                                      coalesced=True, error="deadline_exceeded",
+                                      failure_chain=[{"model": HF_MODEL, "attempt": 0,
+                                                      "error_message": "deadline_exceeded"}])
+        if not shared and result["model"] != "fallback" and result.get("aborted_at_token") is None:
+            GEN_CACHE.put(cache_key, {"text": result["text"]})
+        return {**result, "failure_chain": list(result["failure_chain"]), "coalesced": shared}
+
+    async def _call_hf(self, topic: str, mode: str, prompt: str, payload: dict,
+                       deadline: float, stream: bool = False) -> dict:
+        """The upstream half of process(): retries, breaker, limiter, fallback."""
+        headers = {"Authorization": f"Bearer {HF_API_KEY}"} if HF_API_KEY else {}
+        url     = f"{HF_API_BASE}/{HF_MODEL}"
+
+        failure_chain  = []
+        wait_for_model = False
+        limiter_stats  = {}
+
+        for attempt in range(1, HF_RETRY_ATTEMPTS + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                failure_chain.append({"model": HF_MODEL, "attempt": attempt,
+                                      "error_message": "deadline_exceeded"})
+                break
+            if not HF_BREAKER.allow():
+                # Open circuit: fall back now instead of waiting out another timeout
+                failure_chain.append({"model": HF_MODEL, "attempt": attempt,
+                                      "error_message": "circuit_open",
+                                      "breaker": HF_BREAKER.snapshot()})
+                break
+
+            body    = {**payload, "options": {"wait_for_model": True}} if wait_for_model else payload
+            timeout = remaining if wait_for_model else min(HF_TIMEOUT_S, remaining)
+            try:
+                if stream:
+                    evaluator = StreamingEvaluator()
+                    raw_text, n_tokens, aborted = await _http_stream(
+                        url, headers, body, evaluator.feed, timeout=timeout, stats=limiter_stats)
+                else:
+                    resp = await _http_post(url, headers, body, timeout=timeout, stats=limiter_stats)
+                    resp.raise_for_status()
+                    data = resp.json()
+                    # HF returns a list of dicts with "generated_text"
+                    if isinstance(data, list) and data:
+                        raw_text = data[0].get("generated_text", "")
+                    else:
+                        raw_text = str(data)
+            except Exception as e:
+                if HF_RETRY.upstream_fault(e):
+                    HF_BREAKER.record(False)
+                else:
+                    HF_BREAKER.release()    # never reached HF: says nothing about its health
+                plan  = HF_RETRY.plan(e, attempt) if attempt < HF_RETRY_ATTEMPTS else None
+                delay = None
+                if plan is not None and time.monotonic() + plan[0] < deadline:
+                    delay, wait_for_model = plan
+                failure_chain.append({
+                    "model":         HF_MODEL,
+                    "attempt":       attempt,
+                    "status":        getattr(getattr(e, "response", None), "status_code", None),
+                    "error_message": (str(e) or type(e).__name__).splitlines()[0],
+                    "retry_in_s":    None if delay is None else round(delay, 3),
+                    "breaker":       HF_BREAKER.snapshot(),
+                })
+                if delay is None:
+                    break
+                await asyncio.sleep(delay)
+                continue
+
+            HF_BREAKER.record(True)
 
             # Strip the echoed prompt back out
             text = raw_text.replace(prompt, "").strip()
             if not text:
                 text = raw_text.strip()
 
-            return {"text": text, "model": HF_MODEL, "mode": mode}
-
-        except Exception as e:
-            # Fallback: deterministic stub so the pipeline never hard-crashes
-            return {
-                "text": _emergency_fallback(topic, mode),
-                "model": "fallback",
-                "mode":  mode,
-                "error": str(e),
-            }
+            result = _generation_result(text, HF_MODEL, mode, attempts=attempt,
+                                        failure_chain=failure_chain,
+                                        queue_wait_ms=round(limiter_stats.get("queue_wait_ms", 0.0), 1),
+                                        concurrency_limit=limiter_stats.get("limit"))
+            if stream:
+                result.update({"stream": True, "tokens": n_tokens,
+                               "aborted_at_token": evaluator.fired_at_token if aborted else None,
+                               "abort_phrase":     evaluator.phrase if aborted else None})
+            return result
+
+        # Fallback: deterministic stub so the pipeline never hard-crashes
+        return _generation_result(
+            _emergency_fallback(topic, mode), "fallback", mode,
+            # requests actually sent (not circuit_open / deadline entries)
+            attempts=sum(1 for f in failure_chain if "retry_in_s" in f),
+            error=failure_chain[-1]["error_message"],
+            failure_chain=failure_chain,
+        )
 
 
 class EvaluationAgent(BaseAgent):
@@ -168,7 +287,30 @@ class EvaluationAgent(BaseAgent):
     async def process(self, input_data: dict) -> dict:
         text       = input_data.get("text", "")
         primitives = input_data.get("primitives", DEFAULT_PRIMITIVES)
-        return evaluate(text, primitives)
+        return EVAL_MEMO.evaluate(text, primitives, input_data.get("memo_stats"))
+
+
+class GateAgent(BaseAgent):
+    """
+    STEP 3 — Pass/fail routing on the evaluation.
+    A streamed draft cut off at a banned product never passes.  Routes to
+    learn only on a fail and while the loop may still regenerate.
+    """
+
+    def __init__(self):
+        super().__init__(name="gate")
+
+    async def process(self, input_data: dict) -> dict:
+        evaluation = input_data["evaluation"]
+        aborted    = input_data.get("generation", {}).get("aborted_at_token") is not None
+        passed     = evaluation["passed"] and not aborted
+        retry      = not passed and input_data.get("can_retry", True)
+        return {
+            "passed": passed,
+            "reason": ("Score ≥ threshold" if passed
+                       else "Score < threshold — learning triggered"),
+            "route":  {"learn": 1.0 if retry else 0.0},
+        }
 
 
 class LearningCircuitAgent(BaseAgent):
@@ -181,29 +323,22 @@ class LearningCircuitAgent(BaseAgent):
         super().__init__(name="learning")
 
     async def process(self, input_data: dict) -> dict:
-        primitives = dict(input_data.get("primitives", DEFAULT_PRIMITIVES))
+        primitives = PrimitiveVector.from_mapping(input_data.get("primitives", DEFAULT_PRIMITIVES))
         issues     = input_data.get("issues", [])
 
+        updated   = {}          # name → new weight; one array copy at the end
         mutations = []
         for issue in issues:
-            t = issue.get("type", "")
-            if t in ("hallucination", "unverified"):
-                old = primitives["fact_verification"]
-                primitives["fact_verification"] = min(1.0, old + 0.15)
-                mutations.append(_mutation("fact_verification", old, primitives["fact_verification"], issue))
-            if t == "hyperbole":
-                old = primitives["anti_hyperbole"]
-                primitives["anti_hyperbole"] = min(1.0, old + 0.10)
-                mutations.append(_mutation("anti_hyperbole", old, primitives["anti_hyperbole"], issue))
-            if t == "missing_source":
-                old = primitives["source_attribution"]
-                primitives["source_attribution"] = min(1.0, old + 0.12)
-                mutations.append(_mutation("source_attribution", old, primitives["source_attribution"], issue))
-            if t == "temporal_vague":
-                old = primitives["temporal_accuracy"]
-                primitives["temporal_accuracy"] = min(1.0, old + 0.10)
-                mutations.append(_mutation("temporal_accuracy", old, primitives["temporal_accuracy"], issue))
-
+            rule = LEARN_RULES.get(issue.get("type", ""))
+            if rule is None:
+                continue
+            name, step = rule
+            old = updated.get(name, primitives[name])
+            updated[name] = min(1.0, old + step)
+            mutations.append(_mutation(name, old, updated[name], issue))
+
+        if updated:
+            primitives = primitives.replace(**updated)
         return {"primitives": primitives, "mutations": mutations}
 
 
@@ -211,20 +346,16 @@ class LearningCircuitAgent(BaseAgent):
 # 2.  PURE-FUNCTION HELPERS  (evaluation logic, prompt builder, fallback)
 # ═══════════════════════════════════════════════════════════════════════════
 
-
 def evaluate(text: str, primitives: dict) -> dict:
     """Pattern-based evaluator — no LLM call needed."""
     issues = []
     score  = 100.0
+    # One `in` per phrase, any() stopping at the first hit: at ~40 phrases
+    # this beats MATCHER.scan(), which has to test every phrase
     lower  = text.lower()
 
     # ── hallucination check ───────────────────────────────────────────
-    banned = [
-        "gpt-5","gpt-6","gpt-7","gpt-8","gpt-9","gpt-10",
-        "llama 4","llama 5","llama 6",
-        "claude 5","claude 6",
-    ]
-    for phrase in banned:
+    for phrase in BANNED_PRODUCTS:
         if phrase in lower:
             issues.append({"type": "hallucination",
                            "message": f"Detected unreleased product: {phrase}",
@@ -232,12 +363,7 @@ def evaluate(text: str, primitives: dict) -> dict:
             score -= 30 * primitives.get("fact_verification", 0.65)
 
     # ── hyperbole check ───────────────────────────────────────────────
-    hyp_words = [
-        "revolutionary","earth-shattering","unprecedented",
-        "game-changing","breakthrough","incredible",
-        "amazing","absolutely","unbelievable",
-    ]
-    hyp_count = sum(1 for w in hyp_words if w in lower)
+    hyp_count = sum(1 for w in HYPERBOLE_WORDS if w in lower)
     if hyp_count >= 3:
         issues.append({"type": "hyperbole",
                        "message": f"Excessive superlatives ({hyp_count} instances)",
@@ -245,15 +371,7 @@ def evaluate(text: str, primitives: dict) -> dict:
         score -= 20 * primitives.get("anti_hyperbole", 0.75)
 
     # ── source attribution ────────────────────────────────────────────
-    has_source = (
-        "according to" in lower or
-        "reported by"  in lower or
-        "sources say"  in lower or
-        any(m in lower for m in [
-            "january","february","march","april","may","june",
-            "july","august","september","october","november","december"
-        ])
-    )
+    has_source = any(s in lower for s in SOURCE_MARKERS)
     if not has_source and len(text.split()) > 20:
         issues.append({"type": "missing_source",
                        "message": "Claims lack specific attribution",
@@ -261,8 +379,7 @@ def evaluate(text: str, primitives: dict) -> dict:
         score -= 15 * primitives.get("source_attribution", 0.72)
 
     # ── temporal vagueness ────────────────────────────────────────────
-    vague_temps = ["recently", "lately", "soon", "the other day"]
-    if any(v in lower for v in vague_temps):
+    if any(v in lower for v in VAGUE_TEMPORAL):
         issues.append({"type": "temporal_vague",
                        "message": "Vague temporal references detected",
                        "severity": "low"})
@@ -276,6 +393,15 @@ def evaluate(text: str, primitives: dict) -> dict:
     }
 
 
+def evaluate_many(texts, primitives: dict) -> dict:
+    """Batch evaluate() — a dict of NumPy arrays with one row per text."""
+    # this rubric has no low_specificity rule
+    return _evaluate_many(texts, primitives, GATE_THRESHOLD, RULE_TYPES[:4])
+
+
+EVAL_MEMO = EvalMemo(EVAL_MEMO_SIZE, evaluate)
+
+
 def _build_prompt(topic: str, primitives: dict, mode: str) -> str:
     if mode == "raw":
         return (
@@ -316,6 +442,241 @@ def _build_prompt(topic: str, primitives: dict, mode: str) -> str:
     )
 
 
+# One shared async client for every HF call: keep-alive pooling (HTTP/2 when
+# `h2` is installed), so awaits actually yield to other episodes and the
+# TLS handshake is paid once per pooled connection, not once per call.
+_http_client = None
+_host_limiters: dict[str, AsyncAdaptiveLimiter] = {}
+
+
+def _get_http_client():
+    global _http_client
+    if _http_client is None:
+        import httpx
+        try:
+            import h2  # noqa: F401
+            http2 = True
+        except ImportError:
+            http2 = False
+        _http_client = httpx.AsyncClient(
+            http2=http2,
+            timeout=HF_TIMEOUT_S,
+            limits=httpx.Limits(max_keepalive_connections=HF_MAX_PER_HOST,
+                                keepalive_expiry=60),
+        )
+    return _http_client
+
+
+@asynccontextmanager
+async def _limited(url: str, timeout: float, stats: dict | None):
+    """
+    Hold one of the host's AdaptiveLimiter slots.  Yields (timeout left
+    after queueing, outcome); set outcome["overloaded"] = False once a
+    non-429/503 response arrives, or outcome["latency_ms"] = None to
+    release without a latency sample.
+    """
+    host    = url.split("/")[2]
+    limiter = _host_limiters.get(host)
+    if limiter is None:
+        limiter = _host_limiters[host] = AsyncAdaptiveLimiter(
+            HF_LIMIT_INITIAL, 1, HF_MAX_PER_HOST, HF_LIMIT_TOLERANCE)
+    waited_ms = await limiter.acquire(timeout)
+    if stats is not None:
+        stats["queue_wait_ms"] = stats.get("queue_wait_ms", 0.0) + waited_ms
+        stats["limit"] = round(limiter.limit, 2)
+    t0 = time.perf_counter()
+    outcome = {"overloaded": True}      # exceptions (timeouts, resets) count as overload
+    try:
+        yield max(0.001, timeout - waited_ms / 1000), outcome
+    finally:
+        await limiter.release(outcome.get("latency_ms", (time.perf_counter() - t0) * 1000),
+                              outcome["overloaded"])
+
+
+async def _http_post(url: str, headers: dict, payload: dict, timeout: float | None = None,
+                     stats: dict | None = None):
+    """POST through the host's AdaptiveLimiter; `stats` collects queue_wait_ms and limit."""
+    async with _limited(url, timeout or HF_TIMEOUT_S, stats) as (left, outcome):
+        resp = await _get_http_client().post(url, headers=headers, json=payload, timeout=left)
+        outcome["overloaded"] = resp.status_code in (429, 503)
+        return resp
+
+
+async def _http_stream(url: str, headers: dict, payload: dict, on_token,
+                       timeout: float | None = None, stats: dict | None = None):
+    """
+    Streamed POST ({"stream": true}, text-generation-inference SSE).  Each
+    token's text goes to on_token(); a truthy return closes the stream
+    there.  Returns (text, tokens, aborted); HTTP errors raise as in
+    raise_for_status(), an `error` event as StreamError.
+    """
+    async with _limited(url, timeout or HF_TIMEOUT_S, stats) as (left, outcome):
+        async with _get_http_client().stream("POST", url, headers=headers,
+                                             json={**payload, "stream": True},
+                                             timeout=left) as resp:
+            outcome["overloaded"] = resp.status_code in (429, 503)
+            if resp.is_error:
+                await resp.aread()
+                resp.raise_for_status()
+            parts, tokens = [], 0
+            async for line in resp.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                event = json.loads(line[5:])
+                if "error" in event:
+                    outcome["overloaded"] = True
+                    raise StreamError(f"stream error: {event['error']}")
+                token = event.get("token") or {}
+                if token.get("special"):
+                    continue
+                tokens += 1
+                parts.append(token.get("text", ""))
+                if on_token(token.get("text", "")):
+                    outcome["latency_ms"] = None    # cut short: not a latency sample
+                    return "".join(parts), tokens, True
+            return "".join(parts), tokens, False
+
+
+# Shared by every GenerationAgent call
+HF_BREAKER = CircuitBreaker("hf_inference", BREAKER_WINDOW_S, BREAKER_MIN_CALLS,
+                            BREAKER_FAILURE_RATE, BREAKER_COOLDOWN_S)
+HF_RETRY   = RetryPolicy(HF_RETRY_BASE_S, HF_RETRY_MAX_S)
+
+
+async def _close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+class MemoryStore:
+    """
+    Episode memory: one pooled async Redis client behind a bounded
+    in-process near-cache with TTL.
+
+    `probe(key, value)` returns the previous value and writes the new one.
+    On a near-cache miss the GET and SET go out in one pipeline (a single
+    round trip, so get_ms == set_ms == roundtrip_ms); on a near-cache hit
+    only the SET is sent.  Without Redis — no URL, `redis` not installed,
+    or the server unreachable — the near-cache is the store, and a failed
+    connection is retried after `retry_s`; until then probes report the
+    last connection error.  Pass `client` to use fakeredis or a pre-built
+    pool.
+    """
+
+    def __init__(self, url: str = "", client=None, near_size: int = 1024,
+                 near_ttl_s: float = 60.0, ttl_s: int = 7 * 24 * 3600,
+                 retry_s: float = 30.0):
+        from collections import OrderedDict
+
+        self.url        = url
+        self.enabled    = bool(url) or client is not None
+        self.ttl_s      = ttl_s
+        self.near_size  = near_size
+        self.near_ttl_s = near_ttl_s if self.enabled else ttl_s
+        self.retry_s    = retry_s
+        self.connect_ms = None
+        self._client    = client
+        self._connected = False
+        self._retry_at  = 0.0
+        self.last_error = None
+        self._near      = OrderedDict()          # key → (expires_at, value)
+
+    def _near_get(self, key: str):
+        entry = self._near.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            self._near.pop(key, None)
+            return None
+        self._near.move_to_end(key)
+        return entry[1]
+
+    def _near_put(self, key: str, value: dict):
+        self._near[key] = (time.monotonic() + self.near_ttl_s, value)
+        self._near.move_to_end(key)
+        while len(self._near) > self.near_size:
+            self._near.popitem(last=False)
+
+    async def _ensure_connected(self) -> bool:
+        if self._connected:
+            return True
+        if not self.enabled or time.monotonic() < self._retry_at:
+            return False
+        t0 = time.perf_counter()
+        try:
+            if self._client is None:
+                import redis.asyncio as aioredis
+                self._client = aioredis.from_url(self.url, decode_responses=True,
+                                                 socket_connect_timeout=2,
+                                                 max_connections=HF_MAX_PER_HOST * 2)
+            await self._client.ping()
+        except Exception as e:
+            self._retry_at  = time.monotonic() + self.retry_s
+            self.last_error = str(e)
+            raise
+        self.connect_ms = round((time.perf_counter() - t0) * 1000, 2)
+        self.last_error = None
+        self._connected = True
+        return True
+
+    async def probe(self, key: str, value: dict) -> dict:
+        out = {"hit": False, "value": None, "near_hit": False, "connected": False,
+               "connect_ms": None, "get_ms": 0.0, "set_ms": 0.0,
+               "roundtrip_ms": 0.0, "error": None}
+
+        t0 = time.perf_counter()
+        cached = self._near_get(key)
+        if cached is not None:
+            out.update(hit=True, value=cached, near_hit=True,
+                       get_ms=round((time.perf_counter() - t0) * 1000, 3))
+        self._near_put(key, value)
+
+        try:
+            if not await self._ensure_connected():
+                out["error"] = self.last_error
+                return out
+            out["connected"], out["connect_ms"] = True, self.connect_ms
+            t0 = time.perf_counter()
+            pipe = self._client.pipeline(transaction=False)
+            if cached is None:
+                pipe.get(key)
+            pipe.set(key, json.dumps(value), ex=self.ttl_s)
+            replies = await pipe.execute()
+            rtt = round((time.perf_counter() - t0) * 1000, 2)
+            out["roundtrip_ms"] = out["set_ms"] = rtt
+            if cached is None:
+                out["get_ms"] = rtt
+                if replies[0] is not None:
+                    out.update(hit=True, value=json.loads(replies[0]))
+        except Exception as e:
+            self._connected = False
+            out["error"] = str(e)
+        return out
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client, self._connected = None, False
+
+
+MEMORY_STORE = MemoryStore(REDIS_URL, near_size=NEAR_CACHE_SIZE,
+                           near_ttl_s=NEAR_CACHE_TTL_S, ttl_s=MEMORY_TTL_S)
+
+
+GEN_CACHE = GenerationCache(GEN_CACHE_SIZE, GEN_CACHE_TTL_S, GEN_CACHE_PATH)
+
+# Identical in-flight prompts (same topic in parallel episodes) → one HF call
+GEN_FLIGHT = AsyncSingleFlight()
+
+
+def _generation_result(text: str, model: str, mode: str, **fields) -> dict:
+    """A GenerationAgent result — the same keys on every path (HF, cache hit, coalesced, fallback)."""
+    return {"text": text, "model": model, "mode": mode, "cache_hit": False, "coalesced": False,
+            "attempts": 0, "failure_chain": [], "queue_wait_ms": 0.0, "concurrency_limit": None,
+            "stream": False, "tokens": None, "aborted_at_token": None, "abort_phrase": None,
+            "error": None, **fields}
+
+
 def _emergency_fallback(topic: str, mode: str) -> str:
     """Deterministic fallback when HF is unreachable."""
     if mode == "raw":
@@ -333,6 +694,14 @@ def _emergency_fallback(topic: str, mode: str) -> str:
     )
 
 
+def _generation_tokens(result: dict, prompt: str) -> int:
+    """Upstream tokens a generation cost (prompt at ~4 chars/token + output); 0 if nothing was sent."""
+    if result.get("cache_hit") or result.get("coalesced") or result["model"] == "fallback":
+        return 0
+    out = result.get("tokens") or round(len(result["text"].split()) * 1.3)
+    return -(-len(prompt) // 4) + out
+
+
 def _mutation(name: str, old: float, new: float, issue: dict) -> dict:
     return {
         "primitive_name": name,
@@ -348,86 +717,255 @@ def _mutation(name: str, old: float, new: float, issue: dict) -> dict:
 # ═══════════════════════════════════════════════════════════════════════════
 
 
+# The declared circuit: handed to Neuron as-is, and run by CircuitExecutor.
+# Signals on "direct" edges are 1.0 (or the source output's "signal"); a
+# "conditional" edge carries output["route"][target].  A node runs when its
+# strongest incoming signal reaches its activation_threshold (default 0.5);
+# "timeout_s" bounds one run of the node.
+NEWSROOM_CIRCUIT = {
+    "name": "LivingNewsroomCircuit",
+    "description": (
+        "Self-optimizing podcast agent. Generates news scripts, "
+        "evaluates quality, learns from failures by updating 6 "
+        "behavioral primitives at runtime."
+    ),
+    "routing_strategy":  "confidence_based",
+    "fallback_strategy": "graceful_degradation",
+    "agents": {
+        # ── INPUT layer ──────────────────────────────────────────────
+        "topic_in": {
+            "type": "ReflexAgent",
+            "role": "INPUT",
+            "capabilities": [
+                "intent_detection",       # what kind of topic?
+                "sentiment_analysis",     # tone of the input
+            ],
+        },
+        "memory": {
+            "type": "ReflexAgent",
+            "role": "INPUT",
+            "capabilities": [
+                "memory_retrieval",       # have we seen this before?
+            ],
+            "timeout_s": 2.0,             # a hung Redis must not hold the episode
+        },
+        # ── PROCESSOR layer ──────────────────────────────────────────
+        "generate": {
+            "type": "DeliberativeAgent",
+            "role": "PROCESSOR",
+            "capabilities": [
+                "text_generation",
+                "prompt_construction",
+                "model_routing",          # raw vs optimized prompt
+            ],
+            "activation_threshold": 0.3,
+        },
+        "evaluate": {
+            "type": "ReflexAgent",
+            "role": "PROCESSOR",
+            "capabilities": [
+                "hallucination_detection",
+                "contradiction_detection",
+                "quality_scoring",
+            ],
+            "activation_threshold": 0.5,
+        },
+        "gate": {
+            "type": "ReflexAgent",
+            "role": "PROCESSOR",
+            "capabilities": [
+                "threshold_comparison",
+                "pass_fail_routing",
+            ],
+            "activation_threshold": 0.8,
+        },
+        # ── LEARNING layer ───────────────────────────────────────────
+        "learn": {
+            "type": "LearningAgent",
+            "role": "OUTPUT",
+            "capabilities": [
+                "pattern_recognition",
+                "strategy_evolution",     # update primitives
+                "state_persistence",      # write back to memory
+            ],
+        },
+    },
+    "connections": [
+        {"source": "topic_in",  "target": "memory",    "type": "direct"},   # runs beside generate
+        {"source": "topic_in",  "target": "generate",  "type": "direct"},
+        {"source": "generate",  "target": "evaluate",  "type": "direct"},
+        {"source": "evaluate",  "target": "gate",      "type": "direct"},
+        {"source": "gate",      "target": "learn",     "type": "conditional"},  # only on fail
+        {"source": "learn",     "target": "generate",  "type": "conditional"},  # regenerate loop
+    ],
+}
+
+
 def build_newsroom_circuit(core) -> str:
     """
     Defines the 5-step circuit visible in the screenshot plus the
     Neuron orchestrator capabilities shown at the bottom.
     """
-    circuit_def = CircuitDefinition.create(
-        name="LivingNewsroomCircuit",
-        description=(
-            "Self-optimizing podcast agent. Generates news scripts, "
-            "evaluates quality, learns from failures by updating 6 "
-            "behavioral primitives at runtime."
-        ),
-        routing_strategy="confidence_based",
-        fallback_strategy="graceful_degradation",
-        agents={
-            # ── INPUT layer ──────────────────────────────────────────
-            "topic_in": {
-                "type": "ReflexAgent",
-                "role": "INPUT",
-                "capabilities": [
-                    "intent_detection",       # what kind of topic?
-                    "sentiment_analysis",     # tone of the input
-                    "memory_retrieval",       # have we seen this before?
-                ],
-            },
-            # ── PROCESSOR layer ──────────────────────────────────────
-            "generate": {
-                "type": "DeliberativeAgent",
-                "role": "PROCESSOR",
-                "capabilities": [
-                    "text_generation",
-                    "prompt_construction",
-                    "model_routing",          # raw vs optimized prompt
-                ],
-                "activation_threshold": 0.3,
-            },
-            "evaluate": {
-                "type": "ReflexAgent",
-                "role": "PROCESSOR",
-                "capabilities": [
-                    "hallucination_detection",
-                    "contradiction_detection",
-                    "quality_scoring",
-                ],
-                "activation_threshold": 0.5,
-            },
-            "gate": {
-                "type": "ReflexAgent",
-                "role": "PROCESSOR",
-                "capabilities": [
-                    "threshold_comparison",
-                    "pass_fail_routing",
-                ],
-                "activation_threshold": 0.8,
-            },
-            # ── LEARNING layer ───────────────────────────────────────
-            "learn": {
-                "type": "LearningAgent",
-                "role": "OUTPUT",
-                "capabilities": [
-                    "pattern_recognition",
-                    "strategy_evolution",     # update primitives
-                    "state_persistence",      # write back to memory
-                ],
-            },
-        },
-        connections=[
-            {"source": "topic_in",  "target": "generate",  "type": "direct"},
-            {"source": "generate",  "target": "evaluate",  "type": "direct"},
-            {"source": "evaluate",  "target": "gate",      "type": "direct"},
-            {"source": "gate",      "target": "learn",     "type": "conditional"},  # only on fail
-            {"source": "learn",     "target": "generate",  "type": "conditional"},  # regenerate loop
-        ],
-    )
+    circuit_def = CircuitDefinition.create(**NEWSROOM_CIRCUIT)
 
     circuit_id = core.circuit_designer.create_circuit(circuit_def)
     core.circuit_designer.deploy_circuit(circuit_id)
     return circuit_id
 
 
+class CircuitExecutor:
+    """
+    Runs a circuit spec (NEWSROOM_CIRCUIT) as a dataflow graph.
+
+    Edges that close a cycle (learn → generate) are found once by DFS and
+    treated as loop edges; the rest form a DAG.  A round runs that DAG:
+    every node whose upstream nodes have settled is started at once, so
+    independent nodes (memory beside generate) overlap.  A node below its
+    activation_threshold is skipped, and one that outlives its timeout_s
+    is cancelled and marked "timeout"; either way it sends no signal on.
+    When a loop edge fires, the next round re-runs only what lies
+    downstream of its target, up to `max_rounds` extra rounds.
+
+    `handlers` maps node → async fn(ctx) -> dict; ctx carries "round",
+    "max_rounds" and the latest "outputs" of every node.
+    """
+
+    default_threshold = 0.5
+
+    def __init__(self, spec: dict, handlers: dict, max_rounds: int = 1):
+        self.nodes      = spec["agents"]
+        self.handlers   = handlers
+        self.max_rounds = max_rounds
+        self._in  = {n: [] for n in self.nodes}
+        self._out = {n: [] for n in self.nodes}
+        for edge in spec["connections"]:
+            self._in[edge["target"]].append(edge)
+            self._out[edge["source"]].append(edge)
+        self.loop_edges = self._find_loop_edges()
+        self._fwd_in = {n: [e for e in self._in[n] if e not in self.loop_edges]
+                        for n in self.nodes}
+        self.roots = [n for n in self.nodes if not self._fwd_in[n]]
+
+    def _find_loop_edges(self) -> list:
+        state, loops = {}, []
+
+        def visit(node):
+            state[node] = "open"
+            for edge in self._out[node]:
+                target = edge["target"]
+                if state.get(target) == "open":
+                    loops.append(edge)
+                elif target not in state:
+                    visit(target)
+            state[node] = "closed"
+
+        for node in [n for n in self.nodes if not self._in[n]] + list(self.nodes):
+            if node not in state:
+                visit(node)
+        return loops
+
+    def _threshold(self, node: str) -> float:
+        return self.nodes[node].get("activation_threshold", self.default_threshold)
+
+    @staticmethod
+    def _signal(edge: dict, run: dict | None) -> float:
+        if run is None or run["status"] != "done":
+            return 0.0
+        if edge["type"] == "conditional":
+            return float(run["output"].get("route", {}).get(edge["target"], 0.0))
+        return float(run["output"].get("signal", 1.0))
+
+    def _downstream(self, starts) -> set:
+        seen, stack = set(), list(starts)
+        while stack:
+            node = stack.pop()
+            if node not in seen:
+                seen.add(node)
+                stack.extend(e["target"] for e in self._out[node] if e not in self.loop_edges)
+        return seen
+
+    async def run(self, ctx: dict) -> dict:
+        ctx.update(round=0, max_rounds=self.max_rounds, outputs={})
+        runs, trace = {}, []
+        entry = {n: 1.0 for n in self.roots}
+        scope = set(self.nodes)
+        t0 = time.perf_counter()
+        while True:
+            await self._run_round(scope, entry, runs, ctx, trace, t0)
+            fired = [e for e in self.loop_edges if e["source"] in scope
+                     and self._signal(e, runs.get(e["source"])) >= self._threshold(e["target"])]
+            if not fired or ctx["round"] >= self.max_rounds:
+                break
+            ctx["round"] += 1
+            entry = {e["target"]: self._signal(e, runs[e["source"]]) for e in fired}
+            scope = self._downstream(entry)
+        return {"rounds": ctx["round"], "trace": trace}
+
+    async def _run_round(self, scope: set, entry: dict, runs: dict, ctx: dict,
+                         trace: list, t0: float):
+        for node in scope:
+            runs.pop(node, None)
+        pending, running = set(scope), {}
+        while pending or running:
+            progressed = True
+            while progressed:                   # a skip can unblock another node
+                progressed = False
+                for node in sorted(pending):
+                    if any(e["source"] in pending or e["source"] in running.values()
+                           for e in self._fwd_in[node]):
+                        continue
+                    pending.discard(node)
+                    progressed = True
+                    signal = max([entry.get(node, 0.0)]
+                                 + [self._signal(e, runs.get(e["source"])) for e in self._fwd_in[node]])
+                    if signal < self._threshold(node):
+                        runs[node] = {"node": node, "round": ctx["round"], "status": "skipped",
+                                      "output": None, "signal": signal}
+                        trace.append({k: v for k, v in runs[node].items() if k != "output"})
+                        continue
+                    task = asyncio.create_task(self._run_node(node, ctx, t0))
+                    running[task] = node
+            if not running:
+                break
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                node = running.pop(task)
+                try:
+                    runs[node] = task.result()
+                except BaseException:
+                    for other in running:
+                        other.cancel()
+                    raise
+                if runs[node]["status"] == "done":
+                    ctx["outputs"][node] = runs[node]["output"]
+                trace.append({k: v for k, v in runs[node].items() if k != "output"})
+
+    async def _run_node(self, node: str, ctx: dict, t0: float) -> dict:
+        started = time.perf_counter()
+        run = {"node": node, "round": ctx["round"], "status": "done", "output": None,
+               "start_ms": round((started - t0) * 1000, 1)}
+        try:
+            run["output"] = await asyncio.wait_for(self.handlers[node](ctx),
+                                                   self.nodes[node].get("timeout_s"))
+        except asyncio.TimeoutError:
+            run["status"] = "timeout"
+        run["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return run
+
+
+# One instance per agent for the whole process — the agents keep no
+# per-episode state, so concurrent episodes share them.
+_AGENT_POOL: dict = {}
+
+
+def agent_pool() -> dict:
+    if not _AGENT_POOL:
+        _AGENT_POOL.update(memory=MemoryProbeAgent(), generate=GenerationAgent(),
+                           evaluate=EvaluationAgent(), gate=GateAgent(),
+                           learn=LearningCircuitAgent())
+    return _AGENT_POOL
+
+
 # ═══════════════════════════════════════════════════════════════════════════
 # 4.  EPISODE RUNNER  — executes one full generate→evaluate→learn loop
 # ═══════════════════════════════════════════════════════════════════════════
@@ -443,103 +981,201 @@ async def run_episode(
     """
     Runs a single episode through the Neuron circuit.
 
+    The step order is not hand-written here: CircuitExecutor runs
+    NEWSROOM_CIRCUIT, and the handlers below only map the episode onto
+    each node's pooled agent (the memory probe overlaps generation).
+    The learn → generate loop runs up to REGEN_MAX_ROUNDS rounds and stops
+    early once a round gains less than REGEN_MIN_DELTA, or when the next
+    call would overrun the deadline or REGEN_TOKEN_BUDGET; the best-scoring
+    text ships, and every round is listed in "rounds".
+
     Returns a result dict with draft, final, scores, mutations — everything
     the dashboard and W&B traces need.
     """
-    import asyncio
-
-    primitives = primitives or dict(DEFAULT_PRIMITIVES)
+    primitives = PrimitiveVector.from_mapping(primitives or DEFAULT_PRIMITIVES)
+    deadline   = time.monotonic() + EPISODE_DEADLINE_S    # shared by every HF attempt
     episode_id = str(uuid.uuid4())[:12]
     boot_id    = hashlib.sha256(f"{episode_id}{time.time()}".encode()).hexdigest()[:8]
+    agents     = agent_pool()
+    eval_memo  = {"hits": 0, "misses": 0}
+    use_cache  = not GEN_CACHE_BYPASS
+    state      = {"primitives_after": primitives, "mutations": [], "rounds": [],
+                  "stop_reason": None, "tokens_used": 0, "last_call_ms": 0.0,
+                  "last_out_tokens": 0, "last_prompt": None,
+                  "best": None, "scored_with": primitives}
 
     print(f"\n{'─'*60}")
     print(f"  Episode {episode_num} | topic: \"{topic}\"")
     print(f"  episode_id={episode_id}  boot_id={boot_id}")
     print(f"{'─'*60}")
 
+    async def topic_in(ctx):
+        return {"topic": topic}
+
     # ── STEP 0: Memory probe ──────────────────────────────────────────
-    print("\n  [STEP 0] Memory Probe …")
-    memory_agent = MemoryProbeAgent()
-    memory_result = await memory_agent.process({
-        "topic": topic, "episode_id": episode_id
-    })
-    print(f"          hit={memory_result['redis_get_hit']}  "
-          f"key={memory_result['redis_key']}  "
-          f"latency={memory_result['redis_get_ms']}ms")
-
-    # ── STEP 1a: Raw generation ───────────────────────────────────────
-    print("\n  [STEP 1] Generation (raw) …")
-    gen_agent = GenerationAgent()
-    draft_result = await gen_agent.process({
-        "topic": topic,
-        "primitives": primitives,
-        "mode": "raw",
-    })
-    draft_text = draft_result["text"]
-    print(f"          {len(draft_text)} chars | model={draft_result['model']}")
-
-    # ── STEP 2: Evaluation ────────────────────────────────────────────
-    print("\n  [STEP 2] Evaluation …")
-    eval_agent = EvaluationAgent()
-    draft_eval = await eval_agent.process({
-        "text": draft_text,
-        "primitives": primitives,
-    })
-    draft_passed = draft_eval["passed"]
-    print(f"          score={draft_eval['score']*100:.0f}/100  "
-          f"{'✅ PASSED' if draft_passed else '❌ FAILED'}  "
-          f"issues={len(draft_eval['issues'])}")
-    for iss in draft_eval["issues"]:
-        print(f"            ⚠️  {iss['message']}")
-
-    # ── STEP 3: Gate ──────────────────────────────────────────────────
-    print("\n  [STEP 3] Gate …")
-    gate_passed = draft_passed
-    gate_reason = "Score ≥ threshold" if gate_passed else "Score < threshold — learning triggered"
-    print(f"          {'✅ PASS' if gate_passed else '❌ FAIL — entering Learn→Regenerate loop'}")
-
-    # ── STEP 4: Learn (only if gate failed) ───────────────────────────
-    primitives_after = dict(primitives)
-    mutations        = []
-
-    if not gate_passed:
-        print("\n  [STEP 4] Learning …")
-        learn_agent = LearningCircuitAgent()
-        learn_result = await learn_agent.process({
-            "primitives": primitives,
-            "issues":     draft_eval["issues"],
+    async def memory(ctx):
+        print("\n  [STEP 0] Memory Probe …")
+        result = await agents["memory"].process({"topic": topic, "episode_id": episode_id})
+        print(f"          hit={result['redis_get_hit']}  "
+              f"key={result['redis_key']}  "
+              f"latency={result['redis_get_ms']}ms")
+        return result
+
+    # ── STEP 1a / 1b: Raw generation, optimized on later rounds ───────
+    async def generate(ctx):
+        draft = ctx["round"] == 0
+        print("\n  [STEP 1] Generation (raw) …" if draft
+              else f"\n  [STEP 1b] Regeneration (optimized, round {ctx['round']}) …")
+        prims  = primitives if draft else state["primitives_after"]
+        mode   = "raw" if draft else "optimized"
+        t0     = time.perf_counter()
+        result = await agents["generate"].process({
+            "topic": topic,
+            "primitives": prims,
+            "mode": mode,
+            "deadline": deadline,
+            "stream": HF_STREAM and draft,
+        })
+        prompt = _build_prompt(topic, prims, mode)
+        tokens = _generation_tokens(result, prompt)
+        state["tokens_used"]    += tokens
+        state["last_call_ms"]    = (time.perf_counter() - t0) * 1000
+        state["last_out_tokens"] = result.get("tokens") or round(len(result["text"].split()) * 1.3)
+        if draft:
+            state["draft"] = result
+        else:
+            state["rounds"][-1].update(model=result["model"], tokens=tokens)
+            state["last_prompt"] = prompt
+        print(f"          {len(result['text'])} chars | model={result['model']}"
+              f"{'  (cache hit)' if result.get('cache_hit') else ''}"
+              + (f"  (aborted at token {result['aborted_at_token']}: "
+                 f"{result['abort_phrase']})" if result.get("aborted_at_token") else ""))
+        return result
+
+    # ── STEP 2 / 5: Evaluation of the draft, then of each regeneration ─
+    async def evaluate(ctx):
+        draft = ctx["round"] == 0
+        print("\n  [STEP 2] Evaluation …" if draft
+              else f"\n  [STEP 5] Evaluation (round {ctx['round']}) …")
+        prims  = primitives if draft else state["primitives_after"]
+        text   = ctx["outputs"]["generate"]["text"]
+        result = await agents["evaluate"].process({
+            "text": text, "primitives": prims, "memo_stats": eval_memo,
+        })
+        if draft:
+            # A cut-off draft is scored as a fail and is no baseline:
+            # any regeneration beats shipping it
+            if ctx["outputs"]["generate"].get("aborted_at_token") is None:
+                state["best"] = text
+            else:
+                result = {**result, "score": 0.0, "passed": False, "stream_aborted": True}
+            state["draft_eval"] = result
+        else:
+            # Compare against the best text so far under the same weights
+            baseline = (EVAL_MEMO.evaluate(state["best"], prims, eval_memo)["score"]
+                        if state["best"] is not None else 0.0)
+            delta = round(result["score"] - baseline, 4)
+            state["rounds"][-1].update(score=result["score"], delta=delta)
+            if state["best"] is None or delta > 0:
+                state["best"], state["scored_with"] = text, prims
+        print(f"          score={result['score']*100:.0f}/100  "
+              f"{'✅ PASSED' if result['passed'] else '❌ FAILED'}"
+              + (f"  issues={len(result['issues'])}" if draft
+                 else f"  Δ={state['rounds'][-1]['delta']:+.3f}"))
+        if draft:
+            for iss in result["issues"]:
+                print(f"            ⚠️  {iss['message']}")
+        return result
+
+    # ── STEP 3: Gate (another round only while the last one paid off) ──
+    async def gate(ctx):
+        n        = ctx["round"]
+        improved = n == 0 or state["rounds"][-1]["delta"] >= REGEN_MIN_DELTA
+        result = await agents["gate"].process({
+            "evaluation": ctx["outputs"]["evaluate"],
+            "generation": ctx["outputs"]["generate"],
+            "can_retry":  n < ctx["max_rounds"] and improved,
         })
-        primitives_after = learn_result["primitives"]
-        mutations        = learn_result["mutations"]
+        if result["passed"]:
+            state["stop_reason"] = "passed"
+        elif not result["route"]["learn"]:
+            state["stop_reason"] = "no_improvement" if not improved else "round_cap"
+        if n == 0:
+            print("\n  [STEP 3] Gate …")
+            print(f"          {'✅ PASS' if result['passed'] else '❌ FAIL — entering Learn→Regenerate loop'}")
+            state["gate"] = result
+        elif state["stop_reason"]:
+            print(f"          ⏹️  stopping after round {n} — {state['stop_reason']}")
+        return result
+
+    # ── STEP 4: Learn (gate → learn only fires on a fail) ─────────────
+    async def learn(ctx):
+        n = ctx["round"] + 1                    # the round this learning feeds
+        print(f"\n  [STEP 4] Learning (round {n}) …")
+        result = await agents["learn"].process({
+            "primitives": state["primitives_after"],
+            "issues":     ctx["outputs"]["evaluate"]["issues"],
+        })
+        mutations = [{**m, "round": n} for m in result["mutations"]]
+        record    = {"round": n, "mutations": mutations, "model": None,
+                     "score": None, "delta": None, "tokens": 0, "skipped": None}
+        state["rounds"].append(record)
+        state["primitives_after"] = result["primitives"]
+        state["mutations"]       += mutations
         for m in mutations:
             print(f"            ⚡ {m['primitive_name']}: "
                   f"{m['old_weight']:.2f} → {m['new_weight']:.2f}  ({m['reason']})")
 
-        # ── STEP 1b: Regenerate (optimized) ─────────────────────────
-        print("\n  [STEP 1b] Regeneration (optimized) …")
-        final_result = await gen_agent.process({
-            "topic": topic,
-            "primitives": primitives_after,
-            "mode": "optimized",
-        })
-        final_text = final_result["text"]
-        print(f"          {len(final_text)} chars | model={final_result['model']}")
-    else:
-        final_text = draft_text
-
-    # ── STEP 5: Final evaluation ──────────────────────────────────────
-    print("\n  [STEP 5] Final Evaluation …")
-    final_eval = await eval_agent.process({
-        "text": final_text,
-        "primitives": primitives_after,
-    })
+        prompt       = _build_prompt(topic, result["primitives"], "optimized")
+        remaining_ms = (deadline - time.monotonic()) * 1000
+        est_tokens   = -(-len(prompt) // 4) + state["last_out_tokens"]
+        if use_cache and prompt == state["last_prompt"]:
+            record["skipped"] = "prompt_unchanged"  # the cache would hand back the same text
+        elif remaining_ms < max(REGEN_MIN_BUDGET_MS, state["last_call_ms"]):
+            record["skipped"] = "deadline_exceeded"
+        elif REGEN_TOKEN_BUDGET and state["tokens_used"] + est_tokens > REGEN_TOKEN_BUDGET:
+            record["skipped"] = "token_budget"
+        if record["skipped"]:
+            state["stop_reason"] = record["skipped"]
+            print(f"\n  [STEP 1b] Regeneration (optimized, round {n}) …")
+            print(f"          ⏭️  skipped — {record['skipped']}, keeping the best text so far")
+        return {**result, "route": {"generate": 0.0 if record["skipped"] else 1.0}}
+
+    executor = CircuitExecutor(NEWSROOM_CIRCUIT, {
+        "topic_in": topic_in, "memory": memory, "generate": generate,
+        "evaluate": evaluate, "gate": gate, "learn": learn,
+    }, max_rounds=REGEN_MAX_ROUNDS)
+    ctx = {}
+    run = await executor.run(ctx)
+
+    draft_result     = state["draft"]
+    draft_text       = draft_result["text"]
+    draft_eval       = state["draft_eval"]
+    gate_passed      = state["gate"]["passed"]
+    gate_reason      = state["gate"]["reason"]
+    primitives_after = state["primitives_after"]
+    mutations        = state["mutations"]
+    rounds           = state["rounds"]
+    regenerated      = [r for r in rounds if r["score"] is not None]
+    regen_skipped    = rounds[0]["skipped"] if rounds else None
+    memory_result    = ctx["outputs"].get("memory") or {"redis_get_hit": False, "redis_error": "timeout"}
+    shipped_fallback = state["best"] is None
+    if shipped_fallback:
+        # Aborted draft and no round got to regenerate (deadline, token budget,
+        # round cap): ship the canned optimized text, never the cut-off draft
+        state["best"], state["scored_with"] = _emergency_fallback(topic, "optimized"), primitives_after
+    final_text       = state["best"]
+    final_eval       = (EVAL_MEMO.evaluate(final_text, state["scored_with"], eval_memo)
+                        if regenerated or shipped_fallback else draft_eval)
+    print(f"\n  [STEP 6] Final Check … {len(regenerated)} round(s), "
+          f"stop={state['stop_reason']}, ~{state['tokens_used']} tokens")
     print(f"          score={final_eval['score']*100:.0f}/100  "
           f"{'✅ PASSED' if final_eval['passed'] else '❌ FAILED'}")
 
     # ── Neuron SynapticBus: broadcast completion ──────────────────────
     completion_msg = Message.create(
         sender="newsroom_orchestrator",
-        recipients=["topic_in", "generate", "evaluate", "gate", "learn"],
+        recipients=list(NEWSROOM_CIRCUIT["agents"]),
         content={
             "type": "episode_complete",
             "episode_id": episode_id,
@@ -560,8 +1196,8 @@ async def run_episode(
         "episode_num":      episode_num,
         "topic":            topic,
         "model":            draft_result["model"],
-        "primitives_before": primitives,
-        "primitives_after":  primitives_after,
+        "primitives_before": primitives.to_dict(),
+        "primitives_after":  primitives_after.to_dict(),
         "gate_threshold":   GATE_THRESHOLD,
         "draft_text":       draft_text,
         "draft_eval":       draft_eval,
@@ -571,11 +1207,19 @@ async def run_episode(
         "memory_telemetry": memory_result,
         "gate_passed":      gate_passed,
         "gate_reason":      gate_reason,
+        "regen_skipped":    regen_skipped,
+        "rounds":           rounds,
+        "stop_reason":      state["stop_reason"],
+        "shipped_fallback": shipped_fallback,
+        "tokens_used":      state["tokens_used"],
+        "aborted_at_token": draft_result.get("aborted_at_token"),
+        "eval_memo":        eval_memo,
+        "circuit_trace":    run["trace"],
     }
 
     print(f"\n  ✅ Episode {episode_num} complete. "
           f"Draft {draft_eval['score']*100:.0f} → Final {final_eval['score']*100:.0f}  "
-          f"| {len(mutations)} mutation(s)")
+          f"| {len(mutations)} mutation(s), {len(regenerated)} round(s)")
 
     return result
 
@@ -602,8 +1246,6 @@ DEMO_TOPICS = [
 
 
 async def main():
-    import asyncio
-
     print("=" * 60)
     print("  🧠 LIVING NEWSROOM — Neuron Circuit")
     print("  Self-optimizing podcast agent")
@@ -618,11 +1260,9 @@ async def main():
 
     # ── Register custom agents ────────────────────────────────────────
     print("\n🔌 Registering custom agents …")
-    core.agent_manager.register(MemoryProbeAgent())
-    core.agent_manager.register(GenerationAgent())
-    core.agent_manager.register(EvaluationAgent())
-    core.agent_manager.register(LearningCircuitAgent())
-    print("   ✅ 4 custom agents registered")
+    for agent in agent_pool().values():     # the same instances run_episode uses
+        core.agent_manager.register(agent)
+    print(f"   ✅ {len(agent_pool())} custom agents registered")
 
     # ── Build circuit ─────────────────────────────────────────────────
     print("\n🏗️  Building LivingNewsroomCircuit …")
@@ -644,9 +1284,11 @@ async def main():
     print("  🚀 Running demo episodes …")
     print("=" * 60)
 
-    primitives = dict(DEFAULT_PRIMITIVES)   # primitives evolve across episodes
+    # Primitives evolve across episodes — and across runs sharing PRIMITIVES_DB
+    store = SQLitePrimitivesStore(PRIMITIVES_DB) if PRIMITIVES_DB else MemoryPrimitivesStore()
 
     for i, topic in enumerate(DEMO_TOPICS, start=1):
+        primitives, version = store.latest()
         result = await run_episode(
             core=core,
             circuit_id=circuit_id,
@@ -655,8 +1297,8 @@ async def main():
             episode_num=i,
         )
 
-        # Carry forward the learned primitives
-        primitives = result["primitives_after"]
+        # Carry forward the learned primitives, merged with any concurrent run's
+        store.commit(primitives, version, PrimitiveVector.from_mapping(result["primitives_after"]))
 
         # Store episode in episodic memory so Neuron can reference it later
         episodic.store({
@@ -667,19 +1309,20 @@ async def main():
                 "topic": topic,
                 "score": result["final_eval"]["score"],
                 "mutations": len(result["mutations"]),
+                "rounds": len([r for r in result["rounds"] if r["score"] is not None]),
             },
             "resolution": "passed" if result["final_eval"]["passed"] else "degraded",
         })
 
-        if i < len(DEMO_TOPICS):
-            print(f"\n  ⏳ Sleeping 3s before next episode …")
-            await asyncio.sleep(3)
+        # No fixed sleep between episodes: HF calls are paced by the
+        # per-host AdaptiveLimiter, which backs off on 429s / rising latency
 
     # ── Final primitives report ───────────────────────────────────────
     print("\n" + "=" * 60)
     print("  📊 SESSION SUMMARY")
     print("=" * 60)
-    print("\n  Final primitive weights after learning:")
+    primitives, version = store.latest()
+    print(f"\n  Final primitive weights after learning (v{version}, {store.backend}):")
     for name, val in primitives.items():
         bar = "█" * int(val * 40)
         print(f"    {name:25s} {val:.2f}  {bar}")
@@ -689,10 +1332,14 @@ async def main():
         context={"event": "episode_complete"},
         timeframe="last_30_days"
     )
+    for host, limiter in _host_limiters.items():
+        print(f"  🚦 {host}: {limiter.snapshot()}")
     print(f"\n  📚 Episodic memory contains {len(history) if history else 0} episode records")
     print("\n  ✅ Done. All decisions are traceable via Neuron's explainability layer.")
 
+    await _close_http_client()
+    await MEMORY_STORE.close()
+
 
 if __name__ == "__main__":
-    import asyncio
     asyncio.run(main())
@@ -0,0 +1,117 @@
+"""Tests for CircuitExecutor — the dataflow runner behind run_episode()."""
+
+import asyncio, time
+
+import pytest
+
+pytest.importorskip("neuron")           # newsroom_circuit imports the Neuron framework at load
+
+from newsroom_circuit import CircuitExecutor, NEWSROOM_CIRCUIT
+
+
+def _spec(timeouts=None):
+    """A copy of NEWSROOM_CIRCUIT with per-node timeout_s overrides."""
+    agents = {n: {**a, **({"timeout_s": timeouts[n]} if timeouts and n in timeouts else {})}
+              for n, a in NEWSROOM_CIRCUIT["agents"].items()}
+    return {"agents": agents, "connections": NEWSROOM_CIRCUIT["connections"]}
+
+
+def _handlers(**overrides):
+    """Every node returns at once; gate sends the episode to learn, learn back to generate."""
+    async def ok(ctx):
+        return {}
+
+    async def gate(ctx):
+        return {"route": {"learn": 1.0}}
+
+    async def learn(ctx):
+        return {"route": {"generate": 1.0}}
+
+    handlers = {n: ok for n in NEWSROOM_CIRCUIT["agents"]}
+    handlers.update(gate=gate, learn=learn)
+    handlers.update(overrides)
+    return handlers
+
+
+def _statuses(trace, round_=0):
+    return {t["node"]: t["status"] for t in trace if t["round"] == round_}
+
+
+def test_learn_to_generate_is_the_loop_edge():
+    executor = CircuitExecutor(_spec(), _handlers())
+    assert [(e["source"], e["target"]) for e in executor.loop_edges] == [("learn", "generate")]
+    assert executor.roots == ["topic_in"]
+
+
+def test_loop_reruns_downstream_of_generate_up_to_max_rounds():
+    executor = CircuitExecutor(_spec(), _handlers(), max_rounds=2)
+    run = asyncio.run(executor.run({}))
+    assert run["rounds"] == 2
+    assert set(_statuses(run["trace"], 1)) == {"generate", "evaluate", "gate", "learn"}
+    assert "memory" not in _statuses(run["trace"], 2)
+
+
+def test_independent_nodes_overlap():
+    async def slow(ctx):
+        await asyncio.sleep(0.1)
+        return {}
+
+    executor = CircuitExecutor(_spec(), _handlers(memory=slow, generate=slow), max_rounds=0)
+    t0 = time.perf_counter()
+    asyncio.run(executor.run({}))
+    assert time.perf_counter() - t0 < 0.18       # memory beside generate, not after
+
+
+def test_conditional_edge_below_threshold_skips_the_target():
+    async def gate(ctx):
+        return {"route": {"learn": 0.0}}
+
+    run = asyncio.run(CircuitExecutor(_spec(), _handlers(gate=gate), max_rounds=3).run({}))
+    assert run["rounds"] == 0
+    assert _statuses(run["trace"])["learn"] == "skipped"
+
+
+def test_node_timeout_is_marked_and_sends_no_signal():
+    async def hang(ctx):
+        await asyncio.sleep(5)
+
+    ctx = {}
+    run = asyncio.run(CircuitExecutor(_spec({"memory": 0.05}), _handlers(memory=hang)).run(ctx))
+    statuses = _statuses(run["trace"])
+    assert statuses["memory"] == "timeout"
+    assert statuses["generate"] == "done"       # siblings are unaffected
+    assert "memory" not in ctx["outputs"]
+
+
+def test_timeout_upstream_skips_downstream():
+    async def hang(ctx):
+        await asyncio.sleep(5)
+
+    run = asyncio.run(CircuitExecutor(_spec({"generate": 0.05}), _handlers(generate=hang)).run({}))
+    statuses = _statuses(run["trace"])
+    assert statuses["generate"] == "timeout"
+    assert statuses["evaluate"] == statuses["gate"] == statuses["learn"] == "skipped"
+
+
+def test_handler_error_propagates_and_cancels_running_nodes():
+    cancelled = []
+
+    async def boom(ctx):
+        raise RuntimeError("generate failed")
+
+    async def slow(ctx):
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append("memory")
+            raise
+
+    executor = CircuitExecutor(_spec(), _handlers(generate=boom, memory=slow))
+
+    async def scenario():
+        with pytest.raises(RuntimeError, match="generate failed"):
+            await executor.run({})
+        await asyncio.sleep(0)                  # let the cancellation land
+
+    asyncio.run(scenario())
+    assert cancelled == ["memory"]